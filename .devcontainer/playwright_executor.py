@@ -1,13 +1,148 @@
 import asyncio
+from contextlib import asynccontextmanager
 from playwright.async_api import async_playwright
 import argparse
 from datetime import datetime
 import os
 import json
 from pathlib import Path
+import re
+import sys
 import tempfile
+import time
 import base64
 
+def new_result():
+    return {
+        "status": "success",
+        "data": {
+            "screenshots": [],
+            "console_logs": [],
+            "error": None,
+            "output": None
+        }
+    }
+
+def elapsed_ms(since: float) -> float:
+    return round((time.perf_counter() - since) * 1000, 1)
+
+async def run_script(page, url: str, script: str, run_dir: Path, screenshot_path: Path, capture_logs: bool,
+                     timestamp: str, timings: dict = None):
+    """
+    Runs a script against an open page and captures its outputs into run_dir.
+    Fills timings, if given, with the navigation, script and capture durations in ms.
+    """
+    timings = {} if timings is None else timings
+    result = new_result()
+    script_path = None
+
+    # Store console logs if requested
+    console_logs = []
+    if capture_logs:
+        page.on("console", lambda msg: console_logs.append(f"{msg.type}: {msg.text}"))
+
+    try:
+        # Navigate to URL first
+        started = time.perf_counter()
+        await page.goto(url, wait_until="networkidle", timeout=30000)
+        timings["navigation_ms"] = elapsed_ms(started)
+
+        # Decode script if base64 encoded
+        if script.startswith('base64:'):
+            script = base64.b64decode(script[7:]).decode('utf-8')
+
+        # Add proper indentation to the script
+        indented_script = ""
+        for line in script.split('\n'):
+            if line.strip():
+                indented_script += "    " + line + "\n"
+            else:
+                indented_script += "\n"
+
+        # Create test script with proper indentation
+        test_script = f"""async def run_test(page, output_dir):
+{indented_script}"""
+
+        # Write the test script to a file for debugging
+        test_script_path = run_dir / "test_script.py"
+        with open(test_script_path, "w") as f:
+            f.write(test_script)
+
+        # Save script to temp file for execution
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
+            f.write(test_script)
+            script_path = f.name
+
+        # Import and execute the script
+        import importlib.util
+        spec = importlib.util.spec_from_file_location("dynamic_script", script_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        # Run the test
+        started = time.perf_counter()
+        output = await module.run_test(page, str(run_dir))
+        timings["script_ms"] = elapsed_ms(started)
+        if output is not None:
+            result["data"]["output"] = output
+
+        # Take a screenshot if none were taken
+        started = time.perf_counter()
+        screenshot_files = list(run_dir.glob('*.{png,jpg,jpeg}'))
+        if not screenshot_files:
+            final_screenshot = run_dir / f"final_{timestamp}.png"
+            await page.screenshot(
+                path=str(final_screenshot),
+                full_page=True,
+                type="jpeg",
+                quality = 50
+            )
+            result["data"]["screenshots"].append(str(final_screenshot))
+
+            # Save additional screenshot to .screenshot folder
+            await page.screenshot(
+                path=str(screenshot_path),
+                full_page=True,
+                type="jpeg",
+                quality = 50
+            )
+        else:
+            result["data"]["screenshots"].extend(str(f) for f in screenshot_files)
+
+        # Save console logs if captured
+        if capture_logs and console_logs:
+            log_path = run_dir / f"console_{timestamp}.log"
+            with open(log_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(console_logs))
+            result["data"]["console_logs"].append(str(log_path))
+        timings["capture_ms"] = elapsed_ms(started)
+
+    except Exception as e:
+        result["status"] = "error"
+        result["data"]["error"] = f"Script error: {str(e)}"
+        error_screenshot = run_dir / f"error_{timestamp}.png"
+        await page.screenshot(
+                path=str(error_screenshot),
+                full_page=True,
+                type="jpeg",
+                quality = 50
+            )
+        result["data"]["screenshots"].append(str(error_screenshot))
+
+        # Save additional screenshot to .screenshot folder
+        await page.screenshot(
+                path=str(screenshot_path),
+                full_page=True,
+                type="jpeg",
+                quality = 50
+            )
+
+    finally:
+        if script_path and os.path.exists(script_path):
+            os.unlink(script_path)
+
+    return result
+
 async def execute_playwright_script(url: str, script: str, output_dir: str = ".screenshots", capture_logs: bool = False):
     """
     Executes a Playwright script and captures outputs.
@@ -25,139 +160,190 @@ async def execute_playwright_script(url: str, script: str, output_dir: str = ".s
 
     screenshot_dir = Path(output_dir)
     screenshot_dir.mkdir(exist_ok=True)
-    
-    result = {
-        "status": "success",
-        "data": {
-            "screenshots": [],
-            "console_logs": [],
-            "error": None,
-            "output": None
-        }
-    }
 
     try:
         async with async_playwright() as p:
             browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context()
-            page = await context.new_page()
-            
-            # Store console logs if requested
-            console_logs = []
-            if capture_logs:
-                page.on("console", lambda msg: console_logs.append(f"{msg.type}: {msg.text}"))
-            
             try:
-                # Navigate to URL first
-                await page.goto(url, wait_until="networkidle", timeout=30000)
-                
-                # Decode script if base64 encoded
-                if script.startswith('base64:'):
-                    script = base64.b64decode(script[7:]).decode('utf-8')
-                
-                # Add proper indentation to the script
-                indented_script = ""
-                for line in script.split('\n'):
-                    if line.strip():
-                        indented_script += "    " + line + "\n"
-                    else:
-                        indented_script += "\n"
-                
-                # Create test script with proper indentation
-                test_script = f"""async def run_test(page, output_dir):
-{indented_script}"""
-
-                # Write the test script to a file for debugging
-                test_script_path = run_dir / "test_script.py"
-                with open(test_script_path, "w") as f:
-                    f.write(test_script)
-
-                # Save script to temp file for execution
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-                    f.write(test_script)
-                    script_path = f.name
-
-                # Import and execute the script
-                import importlib.util
-                spec = importlib.util.spec_from_file_location("dynamic_script", script_path)
-                module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(module)
-                
-                # Run the test
-                output = await module.run_test(page, str(run_dir))
-                if output is not None:
-                    result["data"]["output"] = output
-                
-                # Take a screenshot if none were taken
-                screenshot_files = list(run_dir.glob('*.{png,jpg,jpeg}'))
-                if not screenshot_files:
-                    final_screenshot = run_dir / f"final_{timestamp}.png"
-                    await page.screenshot(
-                        path=str(final_screenshot),
-                        full_page=True,
-                        type="jpeg",
-                        quality = 50
-                    )
-                    result["data"]["screenshots"].append(str(final_screenshot))
-
-                    # Save additional screenshot to .screenshot folder
-                    await page.screenshot(
-                        path=str(screenshot_dir / "screenshot.jpeg"),
-                        full_page=True,
-                        type="jpeg",
-                        quality = 50
-                    )
-                else:
-                    result["data"]["screenshots"].extend(str(f) for f in screenshot_files)
-
-                # Save console logs if captured
-                if capture_logs and console_logs:
-                    log_path = run_dir / f"console_{timestamp}.log"
-                    with open(log_path, "w", encoding="utf-8") as f:
-                        f.write("\n".join(console_logs))
-                    result["data"]["console_logs"].append(str(log_path))
-
-            except Exception as e:
-                result["status"] = "error"
-                result["data"]["error"] = f"Script error: {str(e)}"
-                error_screenshot = run_dir / f"error_{timestamp}.png"
-                await page.screenshot(
-                        path=str(error_screenshot),
-                        full_page=True,
-                        type="jpeg",
-                        quality = 50
-                    )
-                result["data"]["screenshots"].append(str(error_screenshot))
-
-                # Save additional screenshot to .screenshot folder
-                await page.screenshot(
-                        path=str(screenshot_dir / "screenshot.jpeg"),
-                        full_page=True,
-                        type="jpeg",
-                        quality = 50
-                    )
-            
+                context = await browser.new_context()
+                page = await context.new_page()
+                result = await run_script(page, url, script, run_dir, screenshot_dir / "screenshot.jpeg",
+                                          capture_logs, timestamp)
             finally:
-                if os.path.exists(script_path):
-                    os.unlink(script_path)
                 await browser.close()
 
     except Exception as e:
+        result = new_result()
         result["status"] = "error"
         result["data"]["error"] = f"Setup error: {str(e)}"
 
     return result
 
+class BrowserPool:
+    """
+    Chromium browsers shared by every script in a batch.
+
+    Up to `concurrency` scripts run at once, spread evenly over the browsers. Each
+    script gets a fresh context, so cookies, storage and pages never leak between
+    scripts. A browser that has crashed is relaunched the next time it is handed out.
+    """
+
+    def __init__(self, playwright, browsers: int, concurrency: int):
+        self.playwright = playwright
+        self.browsers = [None] * browsers
+        self.locks = [asyncio.Lock() for _ in range(browsers)]
+        self.slots = asyncio.Queue()
+        for slot in range(max(concurrency, browsers)):
+            self.slots.put_nowait(slot % browsers)
+
+    async def start(self):
+        self.browsers = await asyncio.gather(
+            *[self.playwright.chromium.launch(headless=True) for _ in self.browsers]
+        )
+
+    async def browser(self, index: int):
+        async with self.locks[index]:
+            if self.browsers[index] is None or not self.browsers[index].is_connected():
+                self.browsers[index] = await self.playwright.chromium.launch(headless=True)
+            return self.browsers[index]
+
+    @asynccontextmanager
+    async def context(self):
+        index = await self.slots.get()
+        try:
+            browser = await self.browser(index)
+            context = await browser.new_context()
+            try:
+                yield context
+            finally:
+                await context.close()
+        finally:
+            self.slots.put_nowait(index)
+
+    async def close(self):
+        await asyncio.gather(
+            *[browser.close() for browser in self.browsers if browser is not None and browser.is_connected()],
+            return_exceptions=True
+        )
+
+async def execute_batch_entry(pool: BrowserPool, entry: dict, index: int, default_url: str, batch_dir: Path,
+                              screenshot_dir: Path, capture_logs: bool, timestamp: str):
+    """
+    Runs one batch entry in its own context and returns its result with id and timings.
+    """
+    script_id = str(entry.get("id", index))
+    # Each script gets its own run directory, so concurrent scripts never see each other's files.
+    # The entry index keeps it unique when ids repeat or sanitize to the same name.
+    safe_id = re.sub(r"[^\w.-]", "_", script_id)
+    run_dir = batch_dir / f"{index:03d}_{safe_id}"
+    run_dir.mkdir(parents=True, exist_ok=True)
+
+    timings = {}
+    queued = time.perf_counter()
+    try:
+        async with pool.context() as context:
+            timings["wait_ms"] = elapsed_ms(queued)
+            page = await context.new_page()
+            result = await run_script(page, entry.get("url") or default_url, entry["script"], run_dir,
+                                      screenshot_dir / f"screenshot_{run_dir.name}.jpeg",
+                                      entry.get("capture_logs", capture_logs), timestamp, timings)
+    except Exception as e:
+        result = new_result()
+        result["status"] = "error"
+        result["data"]["error"] = f"Setup error: {str(e)}"
+    timings["total_ms"] = elapsed_ms(queued)
+
+    return {"id": script_id, "result": result, "timings": timings}
+
+async def execute_playwright_batch(entries: list, default_url: str = None, output_dir: str = ".screenshots",
+                                   capture_logs: bool = False, browsers: int = 2, concurrency: int = 4):
+    """
+    Executes many scripts concurrently over a shared pool of browsers.
+
+    Each entry is a dict with a "script" and optionally an "id", a "url" (defaulting
+    to default_url) and "capture_logs". Returns one {"id", "result", "timings"} dict
+    per entry, in input order, where result is what execute_playwright_script returns.
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    batch_dir = Path('automation_output') / timestamp
+    batch_dir.mkdir(parents=True, exist_ok=True)
+
+    screenshot_dir = Path(output_dir)
+    screenshot_dir.mkdir(parents=True, exist_ok=True)
+
+    async with async_playwright() as p:
+        pool = BrowserPool(p, browsers, concurrency)
+        started = time.perf_counter()
+        await pool.start()
+        launch_ms = elapsed_ms(started)
+        try:
+            results = await asyncio.gather(*[
+                execute_batch_entry(pool, entry, index, default_url, batch_dir, screenshot_dir, capture_logs, timestamp)
+                for index, entry in enumerate(entries)
+            ])
+        finally:
+            await pool.close()
+
+    return results, {"launch_ms": launch_ms, "total_ms": elapsed_ms(started)}
+
+def read_batch(path: str):
+    """
+    Reads batch entries from a JSONL file, or from stdin if path is '-'.
+    """
+    lines = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        return [json.loads(line) for line in lines if line.strip()]
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+
+def print_batch_timings(results: list, summary: dict):
+    print(f"{'id':<30}{'status':>8}{'wait':>9}{'nav':>9}{'script':>9}{'total':>9}  (ms)", file=sys.stderr)
+    for item in results:
+        timings = item["timings"]
+        print(f"{item['id'][:29]:<30}{item['result']['status']:>8}{timings.get('wait_ms', 0):>9.0f}"
+              f"{timings.get('navigation_ms', 0):>9.0f}{timings.get('script_ms', 0):>9.0f}{timings['total_ms']:>9.0f}",
+              file=sys.stderr)
+    failed = sum(item["result"]["status"] != "success" for item in results)
+    print(f"\n{len(results)} scripts, {failed} failed; browsers launched in {summary['launch_ms']:.0f} ms, "
+          f"batch took {summary['total_ms']:.0f} ms", file=sys.stderr)
+
 def main():
     parser = argparse.ArgumentParser(description="Execute Playwright automation script")
-    parser.add_argument("url", help="URL to automate")
-    parser.add_argument("--script", required=True, help="Playwright script to execute (plain text or base64 encoded with 'base64:' prefix)")
+    parser.add_argument("url", nargs="?", help="URL to automate (the default URL for batch entries)")
+    parser.add_argument("--script", help="Playwright script to execute (plain text or base64 encoded with 'base64:' prefix)")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="JSONL file of scripts to run concurrently ('-' for stdin), one "
+                             "{\"id\", \"url\", \"script\", \"capture_logs\"} object per line")
+    parser.add_argument("--browsers", type=int, default=2, help="Browsers in the pool for --batch")
+    parser.add_argument("--concurrency", type=int, default=4, help="Scripts running at once for --batch")
     parser.add_argument("--output", "-o", default=".screenshots",
                         help="Output directory for screenshots and logs")
     parser.add_argument("--capture-logs", action="store_true", help="Capture console logs")
     
     args = parser.parse_args()
-    
+
+    if args.batch:
+        entries = read_batch(args.batch)
+        if not args.url and any(not entry.get("url") for entry in entries):
+            parser.error("every batch entry needs a url when no default url is given")
+        results, summary = asyncio.run(execute_playwright_batch(
+            entries,
+            args.url,
+            args.output,
+            args.capture_logs,
+            max(args.browsers, 1),
+            max(args.concurrency, 1)
+        ))
+        # One result per line on stdout, in input order; the timing table goes to stderr
+        for item in results:
+            print(json.dumps(item))
+        print_batch_timings(results, summary)
+        return 1 if any(item["result"]["status"] != "success" for item in results) else 0
+
+    if not args.url or not args.script:
+        parser.error("url and --script are required unless --batch is given")
+
     result = asyncio.run(execute_playwright_script(
         args.url,
         args.script,
@@ -168,4 +354,4 @@ def main():
     print(json.dumps(result))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
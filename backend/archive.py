@@ -0,0 +1,74 @@
+"""Cold storage for archived documents as gzipped NDJSON on local disk.
+
+Each archival batch is written to its own files, named after the batch: one per
+fiscal year for payments and one for members. A file is written under a temporary
+name and renamed into place, and a batch whose file already exists is not written
+again, so a rerun after a crash never duplicates documents. Files from before
+batches (FY2023.ndjson.gz, members.ndjson.gz) are still read.
+"""
+import gzip
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional
+
+import orjson
+
+
+def fiscal_year_of(day: datetime, start_month: int) -> int:
+    """The fiscal year a date falls in, named after the calendar year it starts in"""
+    return day.year if day.month >= start_month else day.year - 1
+
+
+def fiscal_year_start(fiscal_year: int, start_month: int) -> datetime:
+    return datetime(fiscal_year, start_month, 1)
+
+
+class ArchiveFiles:
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def payments_path(self, fiscal_year: int, batch: str) -> Path:
+        return self.payment_file(f"FY{fiscal_year}-{batch}.ndjson.gz")
+
+    def payment_file(self, name: str) -> Path:
+        return self.directory / "payments" / name
+
+    def members_path(self, batch: str) -> Path:
+        return self.directory / "members" / f"members-{batch}.ndjson.gz"
+
+    def member_files(self) -> List[Path]:
+        return sorted((self.directory / "members").glob("members*.ndjson.gz"))
+
+    def payment_files(self, from_year: Optional[int] = None, to_year: Optional[int] = None) -> List[Path]:
+        """Payment archive files, optionally limited to fiscal years from_year..to_year"""
+        paths = []
+        for path in sorted((self.directory / "payments").glob("FY*.ndjson.gz")):
+            year = int(path.name[2:6])
+            if (from_year is None or year >= from_year) and (to_year is None or year <= to_year):
+                paths.append(path)
+        return paths
+
+
+def write_ndjson_once(path: Path, docs: Iterable[dict]) -> bool:
+    """Write docs to path unless it already exists; returns whether it was written"""
+    if path.exists():
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".partial")
+    with gzip.open(partial, "wb") as file:
+        for doc in docs:
+            file.write(orjson.dumps(doc, option=orjson.OPT_APPEND_NEWLINE))
+    os.replace(partial, path)
+    return True
+
+
+def scan_ndjson(paths: Iterable[Path], predicate: Callable[[dict], bool]) -> Iterator[dict]:
+    for path in paths:
+        if not path.exists():
+            continue
+        with gzip.open(path, "rb") as file:
+            for line in file:
+                doc = orjson.loads(line)
+                if predicate(doc):
+                    yield doc
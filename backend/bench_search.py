@@ -0,0 +1,130 @@
+"""Latency benchmark for GET /api/members/search against a large member register.
+
+Seeds a benchmark database with members whose names use the spelling variants
+common in the register (Mohammed, Mohamed, Muhammad, ...), then calls the search
+handler in-process for a mix of exact, prefix, misspelt and phone queries. Reports
+p50/p95 handler latency and, separately, the CPU time spent ranking candidates,
+which is the part that holds the event loop.
+
+Needs a MongoDB to seed; the database named by --db-name is dropped first.
+
+Usage: python bench_search.py [--members 50000] [--runs 200] [--skip-seed]
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from functools import wraps
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "masjid_bench")
+
+import server
+
+FIRST_NAMES = [
+    "Mohammed", "Mohamed", "Muhammad", "Mohammad", "Mohd", "Abdul", "Syed", "Imran", "Irfan",
+    "Rafiq", "Rafeeq", "Ahmed", "Ahmad", "Fathima", "Fatima", "Ayesha", "Aisha", "Zubair", "Shabbir",
+]
+LAST_NAMES = [
+    "Rafiq", "Rahman", "Raheem", "Kareem", "Khan", "Pasha", "Shariff", "Sharif", "Begum",
+    "Siddiqa", "Ansari", "Qureshi", "Basha", "Hussain", "Husain", "Ali", "Nawaz", "Ulla",
+]
+QUERIES = [
+    "mohamed rafiq", "muhamad", "mohammed", "abdul rah", "fathima begum", "imran pash",
+    "syed huss", "zubair ansri", "rafeq", "aisha siddiqa", "9845012345",
+]
+TARGET_P95_MS = 20
+
+
+def member_name(rng: random.Random) -> str:
+    parts = [rng.choice(FIRST_NAMES)]
+    if rng.random() < 0.4:
+        parts.append(rng.choice(FIRST_NAMES))
+    parts.append(rng.choice(LAST_NAMES))
+    return " ".join(parts)
+
+
+async def seed(members: int):
+    await server.db.members.drop()
+    await server.ensure_indexes()
+    rng = random.Random(1)
+    batch = []
+    for i in range(members):
+        member = server.Member(
+            name=member_name(rng), phone=f"98450{i:05d}", address=f"{i} Masjid Road, Ripponpet",
+            id_proof_type="Aadhar", id_proof_number=f"BENCH{i:08d}",
+        )
+        batch.append(server.member_doc(member))
+        if len(batch) == 5000:
+            await server.db.members.insert_many(batch)
+            batch = []
+    if batch:
+        await server.db.members.insert_many(batch)
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+async def measure(runs: int):
+    ranking = {"seconds": 0.0}
+    name_score = server.name_score
+
+    @wraps(name_score)
+    def timed_name_score(*args):
+        started = time.perf_counter()
+        try:
+            return name_score(*args)
+        finally:
+            ranking["seconds"] += time.perf_counter() - started
+
+    server.name_score = timed_name_score
+    results = {}
+    try:
+        for query in QUERIES:
+            latencies, cpu = [], []
+            for _ in range(runs):
+                ranking["seconds"] = 0.0
+                started = time.perf_counter()
+                await server.search_members(q=query, limit=20)
+                latencies.append(time.perf_counter() - started)
+                cpu.append(ranking["seconds"])
+            results[query] = (sorted(latencies), sorted(cpu))
+    finally:
+        server.name_score = name_score
+    return results
+
+
+async def main_async(args):
+    server.connect_db()
+    try:
+        if not args.skip_seed:
+            started = time.perf_counter()
+            await seed(args.members)
+            print(f"Seeded {args.members} members in {time.perf_counter() - started:.1f}s")
+        results = await measure(args.runs)
+    finally:
+        server.client.close()
+
+    print(f"\n{'query':<18}{'p50 ms':>9}{'p95 ms':>9}{'rank p95 ms':>13}")
+    worst = 0.0
+    for query, (latencies, cpu) in results.items():
+        p95 = percentile(latencies, 0.95) * 1000
+        worst = max(worst, p95)
+        print(f"{query:<18}{percentile(latencies, 0.5) * 1000:>9.2f}{p95:>9.2f}{percentile(cpu, 0.95) * 1000:>13.2f}")
+    print(f"\nWorst p95 {worst:.2f} ms against a {TARGET_P95_MS} ms target: {'met' if worst <= TARGET_P95_MS else 'MISSED'}")
+    return 0 if worst <= TARGET_P95_MS else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark member search on a large register")
+    parser.add_argument("--members", type=int, default=50000)
+    parser.add_argument("--runs", type=int, default=200, help="calls per query")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the members already seeded")
+    args = parser.parse_args()
+    return asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
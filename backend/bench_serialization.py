@@ -0,0 +1,84 @@
+"""Micro-benchmark for the read-path serialization of members and payments.
+
+Compares the per-row cost of the old path (build a model per document, then
+let FastAPI validate and serialize it again against response_model before
+json.dumps) with the fast path (encode the projected documents with orjson).
+
+Usage: python bench_serialization.py [rows]
+"""
+import json
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+
+from server import Member, Payment
+
+
+def member_docs(rows: int) -> List[dict]:
+    return [
+        Member(
+            name=f"Member {i}",
+            phone=f"98{i:08d}",
+            email=f"member{i}@example.com",
+            address=f"{i} Masjid Road, Ripponpet",
+            id_proof_type="Aadhar",
+            id_proof_number=f"AADHAR{i:08d}",
+        ).model_dump()
+        for i in range(rows)
+    ]
+
+
+def payment_docs(rows: int) -> List[dict]:
+    start = datetime(2025, 1, 1)
+    return [
+        Payment(
+            member_id=str(uuid.uuid4()),
+            member_name=f"Member {i}",
+            member_account_number=f"MM{i:08X}",
+            amount=500.0,
+            payment_type="monthly_chanda",
+            transaction_id=f"TXN{i:010d}",
+            payment_date=start + timedelta(minutes=i),
+            month_year="2025-01",
+        ).model_dump()
+        for i in range(rows)
+    ]
+
+
+def old_path(model, docs: List[dict]) -> bytes:
+    adapter = TypeAdapter(List[model])
+    content = [model(**doc) for doc in docs]
+    # What FastAPI does with a response_model: validate, dump to JSON types, json.dumps
+    validated = adapter.validate_python(content, from_attributes=True)
+    return json.dumps(adapter.dump_python(validated, mode="json")).encode()
+
+
+def fast_path(model, docs: List[dict]) -> bytes:
+    return ORJSONResponse(docs).body
+
+
+def per_row_us(func, model, docs: List[dict], repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(model, docs)
+        best = min(best, time.perf_counter() - started)
+    return best / len(docs) * 1e6
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    print(f"{'model':<10}{'old us/row':>12}{'fast us/row':>13}{'speedup':>9}")
+    for model, docs in ((Member, member_docs(rows)), (Payment, payment_docs(rows))):
+        old = per_row_us(old_path, model, docs)
+        fast = per_row_us(fast_path, model, docs)
+        print(f"{model.__name__:<10}{old:>12.2f}{fast:>13.2f}{old / fast:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""Read-through response cache.
+
+Handlers whose data changes a few times a day are served from a cache of their
+encoded JSON bodies and invalidated explicitly by the write handlers. Redis is
+used when REDIS_URL is set, so every worker shares one cache and sees every
+invalidation; otherwise each process keeps its own LRU, which the TTL bounds.
+"""
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+import orjson
+from fastapi.responses import Response
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """In-process LRU cache whose entries expire ttl seconds after being set"""
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        for key in keys:
+            self._data.pop(key, None)
+
+
+class LocalBackend:
+    name = "local"
+
+    def __init__(self, ttl: float, maxsize: int):
+        self._cache = TTLCache(ttl, maxsize)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: bytes):
+        self._cache.set(key, value)
+
+    async def delete(self, *keys: str):
+        self._cache.delete(*keys)
+
+    async def close(self):
+        pass
+
+
+class RedisBackend:
+    name = "redis"
+
+    def __init__(self, url: str, ttl: float):
+        import redis.asyncio as redis
+
+        self.ttl = int(ttl)
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(key)
+
+    async def set(self, key: str, value: bytes):
+        await self._redis.set(key, value, ex=self.ttl)
+
+    async def delete(self, *keys: str):
+        await self._redis.delete(*keys)
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+class ResponseCache:
+    def __init__(self, backend, prefix: str, on_lookup: Optional[Callable[[str], None]] = None):
+        self.backend = backend
+        self.prefix = prefix
+        # Called with "hit", "miss" or "error", e.g. to feed a metrics counter
+        self.on_lookup = on_lookup or (lambda result: None)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def respond(self, key: str, loader: Callable[[], Awaitable]) -> Response:
+        """Serve the cached JSON body for key, or load, encode and cache it"""
+        return Response(content=await self.body(key, loader), media_type="application/json")
+
+    async def body(self, key: str, loader: Callable[[], Awaitable]) -> bytes:
+        """The cached JSON body for key, loading, encoding and caching it on a miss"""
+        full_key = f"{self.prefix}:{key}"
+        try:
+            body = await self.backend.get(full_key)
+        except Exception as e:
+            # A cache outage must not take the read path down with it
+            logger.warning(f"Cache get failed for {key}: {e}")
+            self.errors += 1
+            self.on_lookup("error")
+            body = None
+
+        if body is not None:
+            self.hits += 1
+            self.on_lookup("hit")
+        else:
+            self.misses += 1
+            self.on_lookup("miss")
+            body = orjson.dumps(await loader())
+            try:
+                await self.backend.set(full_key, body)
+            except Exception as e:
+                logger.warning(f"Cache set failed for {key}: {e}")
+                self.errors += 1
+        return body
+
+    async def invalidate(self, *keys: str):
+        try:
+            await self.backend.delete(*[f"{self.prefix}:{key}" for key in keys])
+        except Exception as e:
+            logger.warning(f"Cache invalidation failed for {keys}: {e}")
+            self.errors += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class VersionStore:
+    """Opaque per-resource versions behind ETag and Last-Modified headers.
+
+    Write handlers bump a resource's version; conditional GETs compare against it
+    without loading the resource. A process that makes every write (shared=False) keeps
+    versions in memory, so a 304 costs no round trip; a restart only hands out new ones.
+    Otherwise every worker must see the same versions, so they are kept where all workers
+    read them and never expire: in Redis when configured, otherwise in one small Mongo
+    document per resource. A resource seen for the first time gets a version once, and
+    every worker agrees on it. When the store can't be read, get returns None and the
+    response goes out without validators.
+    """
+
+    def __init__(self, redis_url: Optional[str], prefix: str, collection: Callable[[], Any],
+                 shared: bool = True):
+        self.prefix = prefix
+        # The Mongo collection is looked up per call: the client is opened after import
+        self.collection = collection
+        self._local = None if shared else {}
+        self._redis = None
+        if redis_url and shared:
+            import redis.asyncio as redis
+
+            self._redis = redis.from_url(redis_url)
+
+    def _new(self) -> Tuple[str, float]:
+        return uuid.uuid4().hex[:12], float(int(time.time()))
+
+    async def get(self, name: str) -> Optional[Tuple[str, float]]:
+        """The (version, modified unix time) of resource name"""
+        if self._local is not None:
+            if name not in self._local:
+                self._local[name] = self._new()
+            return self._local[name]
+        try:
+            if self._redis:
+                return await self._redis_get(name)
+            return await self._mongo_get(name)
+        except Exception as e:
+            logger.warning(f"Version get failed for {name}: {e}")
+            return None
+
+    async def bump(self, name: str) -> Tuple[str, float]:
+        version, modified = self._new()
+        if self._local is not None:
+            self._local[name] = version, modified
+            return version, modified
+        try:
+            if self._redis:
+                await self._redis.set(f"{self.prefix}:{name}", f"{version}:{modified}".encode())
+            else:
+                await self.collection().update_one(
+                    {"_id": name}, {"$set": {"version": version, "modified": modified}}, upsert=True
+                )
+        except Exception as e:
+            logger.error(f"Version bump failed for {name}: {e}")
+        return version, modified
+
+    async def _redis_get(self, name: str) -> Tuple[str, float]:
+        key = f"{self.prefix}:{name}"
+        value = await self._redis.get(key)
+        if value is None:
+            version, modified = self._new()
+            # Only the first worker's version is kept
+            await self._redis.set(key, f"{version}:{modified}".encode(), nx=True)
+            value = await self._redis.get(key)
+        version, modified = value.decode().split(":")
+        return version, float(modified)
+
+    async def _mongo_get(self, name: str) -> Tuple[str, float]:
+        doc = await self.collection().find_one({"_id": name})
+        if doc is None:
+            version, modified = self._new()
+            doc = await self.collection().find_one_and_update(
+                {"_id": name}, {"$setOnInsert": {"version": version, "modified": modified}},
+                upsert=True, return_document=ReturnDocument.AFTER
+            )
+        return doc["version"], doc["modified"]
+
+    async def close(self):
+        if self._redis:
+            await self._redis.aclose()
+
+
+def create_response_cache(redis_url: Optional[str], prefix: str, ttl: float, maxsize: int = 256,
+                          on_lookup: Optional[Callable[[str], None]] = None) -> ResponseCache:
+    backend = RedisBackend(redis_url, ttl) if redis_url else LocalBackend(ttl, maxsize)
+    return ResponseCache(backend, prefix, on_lookup)
@@ -0,0 +1,96 @@
+"""In-process pub/sub for the server-sent events feed.
+
+Each connected screen gets a bounded queue. Publishing never blocks: a screen
+that falls behind loses events rather than holding up the write handlers, and
+picks the current state up again from the next dashboard event.
+
+RedisEventRelay carries events between worker processes when there is no
+change stream to tell every worker about every write.
+"""
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, Optional, Set
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 100
+KEEPALIVE_SECONDS = 15
+RELAY_RETRY_SECONDS = 5
+
+
+class EventBroker:
+    def __init__(self):
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: str, data):
+        if not self._subscribers:
+            return
+        message = format_event(event, data)
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                pass
+
+    async def stream(self, initial: Optional[list] = None) -> AsyncIterator[bytes]:
+        """Yield SSE messages for one subscriber, starting with the (event, data) pairs in initial"""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        try:
+            for event, data in initial or []:
+                yield format_event(event, data)
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line; keeps proxies from closing an idle connection
+                    yield b": keepalive\n\n"
+        finally:
+            self._subscribers.discard(queue)
+
+
+class RedisEventRelay:
+    """Relays (event, data) pairs to every worker over a Redis pub/sub channel.
+
+    Every worker subscribes, the publishing one included, and hands what it
+    receives to deliver. Events published while a worker is reconnecting are
+    lost to that worker, like events a slow screen drops.
+    """
+
+    def __init__(self, url: str, channel: str, deliver: Callable[[str, object], None]):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self.channel = channel
+        self.deliver = deliver
+
+    async def publish(self, event: str, data):
+        await self._redis.publish(self.channel, orjson.dumps([event, data]))
+
+    async def listen_forever(self):
+        while True:
+            try:
+                async with self._redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            event, data = orjson.loads(message["data"])
+                            self.deliver(event, data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event relay error: {e}")
+            await asyncio.sleep(RELAY_RETRY_SECONDS)
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def format_event(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
@@ -0,0 +1,51 @@
+"""Maintenance commands for the masjid management backend.
+
+Usage: python manage.py <command>
+"""
+import argparse
+import asyncio
+
+import server
+
+
+async def rebuild_rollups():
+    rows = await server.rebuild_payment_rollups()
+    print(f"Rebuilt payment_rollups: {rows} rows")
+    rows = await server.rebuild_daily_rollups()
+    print(f"Rebuilt payment_daily_rollups: {rows} rows")
+    rows = await server.rebuild_donor_rollups()
+    print(f"Rebuilt donor_rollups: {rows} rows")
+
+
+async def rebuild_coverage():
+    rows = await server.rebuild_chanda_coverage()
+    print(f"Rebuilt chanda_coverage: {rows} rows")
+
+
+async def archive():
+    result = await server.run_archival()
+    print(f"Archived {result['payments']} payments before FY{result['before_fiscal_year']} "
+          f"and {result['members']} members to {result['target']}")
+
+
+COMMANDS = {
+    "archive": archive,
+    "rebuild-rollups": rebuild_rollups,
+    "rebuild-coverage": rebuild_coverage,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Masjid management maintenance commands")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+
+    server.connect_db()
+    try:
+        asyncio.run(COMMANDS[args.command]())
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Local prayer-time calculation.
+
+Implements the standard PrayTimes.org astronomical formulas with the
+Umm al-Qura parameters used by Aladhan's method=4: Fajr at 18.5 degrees,
+Isha 90 minutes after Maghrib (120 minutes in Ramadan) and the standard
+(Shafi'i) Asr shadow factor. Every day in the requested range is computed
+in one NumPy pass, so a full year takes a few milliseconds.
+
+The Hijri date comes from the tabular Islamic calendar and can differ from
+the sighted Umm al-Qura date by a day.
+"""
+from datetime import date
+from typing import List
+
+import numpy as np
+
+FAJR_ANGLE = 18.5
+SUNSET_ANGLE = 0.833
+ASR_FACTOR = 1
+ISHA_MINUTES = 90
+ISHA_MINUTES_RAMADAN = 120
+
+HIJRI_MONTHS = [
+    "Muharram", "Safar", "Rabi al-awwal", "Rabi al-thani", "Jumada al-ula", "Jumada al-akhirah",
+    "Rajab", "Shaban", "Ramadan", "Shawwal", "Dhu al-Qadah", "Dhu al-Hijjah",
+]
+
+
+def _sin(d):
+    return np.sin(np.radians(d))
+
+
+def _cos(d):
+    return np.cos(np.radians(d))
+
+
+def _tan(d):
+    return np.tan(np.radians(d))
+
+
+def _arcsin(x):
+    return np.degrees(np.arcsin(x))
+
+
+def _arccos(x):
+    return np.degrees(np.arccos(np.clip(x, -1, 1)))
+
+
+def _arctan2(y, x):
+    return np.degrees(np.arctan2(y, x))
+
+
+def _sun_position(jd):
+    """Declination and equation of time (hours) for Julian days jd"""
+    d = jd - 2451545.0
+    g = (357.529 + 0.98560028 * d) % 360
+    q = (280.459 + 0.98564736 * d) % 360
+    L = (q + 1.915 * _sin(g) + 0.020 * _sin(2 * g)) % 360
+    e = 23.439 - 0.00000036 * d
+
+    ra = (_arctan2(_cos(e) * _sin(L), _cos(L)) / 15) % 24
+    eqt = q / 15 - ra
+    eqt = (eqt + 12) % 24 - 12
+    decl = _arcsin(_sin(e) * _sin(L))
+    return decl, eqt
+
+
+def _mid_day(jd, t):
+    _, eqt = _sun_position(jd + t / 24)
+    return (12 - eqt) % 24
+
+
+def _sun_angle_time(jd, lat, angle, t, ccw=False):
+    """Time at which the sun is `angle` degrees below the horizon, before (ccw) or after noon"""
+    decl, _ = _sun_position(jd + t / 24)
+    noon = _mid_day(jd, t)
+    hour_angle = _arccos((-_sin(angle) - _sin(decl) * _sin(lat)) / (_cos(decl) * _cos(lat))) / 15
+    return noon - hour_angle if ccw else noon + hour_angle
+
+
+def _asr_time(jd, lat, factor, t):
+    decl, _ = _sun_position(jd + t / 24)
+    angle = -np.degrees(np.arctan(1 / (factor + _tan(np.abs(lat - decl)))))
+    return _sun_angle_time(jd, lat, angle, t)
+
+
+def _julian_days(ordinals):
+    # date.toordinal() of 2000-01-01 is 730120, whose Julian day at 0h is 2451544.5
+    return ordinals - 730120 + 2451544.5
+
+
+def _hijri(ordinals):
+    """Tabular Islamic calendar (day, month, year) for proleptic Gregorian ordinals"""
+    jdn = ordinals - 730120 + 2451545
+    l = jdn - 1948440 + 10632
+    n = (l - 1) // 10631
+    l = l - 10631 * n + 354
+    j = ((10985 - l) // 5316) * ((50 * l) // 17719) + (l // 5670) * ((43 * l) // 15238)
+    l = l - ((30 - j) // 15) * ((17719 * j) // 50) - (j // 16) * ((15238 * j) // 43) + 29
+    month = (24 * l) // 709
+    day = l - (709 * month) // 24
+    year = 30 * n + j - 30
+    return day, month, year
+
+
+def _format_times(hours):
+    minutes = np.floor(hours * 60 + 0.5).astype(np.int64) % 1440
+    return [f"{m // 60:02d}:{m % 60:02d}" for m in minutes.tolist()]
+
+
+def compute_prayer_times(start: date, end: date, lat: float, lon: float, tz_offset: float) -> List[dict]:
+    """Prayer times for every day from start to end inclusive, as PrayerTimes-shaped dicts"""
+    ordinals = np.arange(start.toordinal(), end.toordinal() + 1)
+    jd = _julian_days(ordinals) - lon / (15 * 24)
+
+    fajr = _sun_angle_time(jd, lat, FAJR_ANGLE, 5.0, ccw=True)
+    dhuhr = _mid_day(jd, 12.0)
+    asr = _asr_time(jd, lat, ASR_FACTOR, 13.0)
+    maghrib = _sun_angle_time(jd, lat, SUNSET_ANGLE, 18.0)
+
+    hijri_day, hijri_month, hijri_year = _hijri(ordinals)
+    isha = maghrib + np.where(hijri_month == 9, ISHA_MINUTES_RAMADAN, ISHA_MINUTES) / 60
+
+    adjust = tz_offset - lon / 15
+    columns = {
+        name: _format_times(times + adjust)
+        for name, times in (("fajr", fajr), ("dhuhr", dhuhr), ("asr", asr), ("maghrib", maghrib), ("isha", isha))
+    }
+
+    days = []
+    for i, ordinal in enumerate(ordinals.tolist()):
+        hd, hm, hy = int(hijri_day[i]), int(hijri_month[i]), int(hijri_year[i])
+        days.append({
+            "date": date.fromordinal(ordinal).isoformat(),
+            "hijri_date": f"{hd:02d}-{hm:02d}-{hy} {HIJRI_MONTHS[hm - 1]} {hy}",
+            **{name: values[i] for name, values in columns.items()},
+        })
+    return days
@@ -0,0 +1,107 @@
+"""Cold-start profile for the backend.
+
+Reports where import time goes, grouped by top-level package (from
+`python -X importtime`), then starts uvicorn with STARTUP_PROFILE=1 and
+measures the time from process launch to the first successful response,
+echoing the per-hook timings the app logs.
+
+Needs MONGO_URL and DB_NAME like the server itself.
+
+Usage: python profile_startup.py [--top 15] [--port 8011] [--skip-serve]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).parent
+
+
+def import_times():
+    """(total_us, {module: (self_us, cumulative_us)}) for `import server` in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if result.returncode:
+        sys.exit(result.stderr)
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules.get("server", (0, 0))[1], modules
+
+
+def report_imports(top: int):
+    total_us, modules = import_times()
+    packages = defaultdict(int)
+    for name, (self_us, _) in modules.items():
+        packages[name.split(".")[0]] += self_us
+
+    print(f"Import of server: {total_us / 1000:.1f} ms")
+    print(f"\n{'package':<32}{'ms':>10}{'share':>8}")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"{package:<32}{self_us / 1000:>10.1f}{self_us / total_us:>8.0%}")
+
+
+def report_first_response(port: int):
+    env = {**os.environ, "STARTUP_PROFILE": "1"}
+    launched = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stderr=subprocess.PIPE, text=True
+    )
+    lines = []
+    reader = threading.Thread(target=lambda: lines.extend(process.stderr), daemon=True)
+    reader.start()
+
+    first_response = None
+    try:
+        deadline = launched + 120
+        while time.perf_counter() < deadline and process.poll() is None:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                    first_response = time.perf_counter() - launched
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait()
+        reader.join(timeout=1)
+
+    print()
+    for line in lines:
+        if "Startup hook" in line or "First response" in line:
+            print(line.split(" - ")[-1].rstrip())
+    if first_response is None:
+        print("Backend never became healthy:")
+        print("".join(lines[-20:]))
+        sys.exit(1)
+    print(f"\nLaunch to first healthy response: {first_response * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile backend import and startup time")
+    parser.add_argument("--top", type=int, default=15, help="packages to list by import time")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--skip-serve", action="store_true", help="only report import times")
+    args = parser.parse_args()
+
+    report_imports(args.top)
+    if not args.skip_serve:
+        report_first_response(args.port)
+
+
+if __name__ == "__main__":
+    main()
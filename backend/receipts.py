@@ -0,0 +1,87 @@
+"""Printable payment receipts.
+
+render_receipt_file runs in a worker process (see render_receipts in server.py),
+so it takes a plain payment dict and imports ReportLab only when first called.
+"""
+import io
+import os
+from datetime import datetime
+
+MASJID_NAME = "MAKKA MASJID RIPPONPET"
+PAYMENT_TYPE_LABELS = {
+    "monthly_chanda": "Monthly Chanda",
+    "ramzan_taravi": "Ramzan Taravi",
+    "donation": "Donation",
+}
+
+
+def format_amount(amount: float) -> str:
+    # The base-14 PDF fonts have no rupee sign
+    return f"Rs. {amount:,.2f}"
+
+
+def render_receipt(payment: dict) -> bytes:
+    from reportlab.lib.pagesizes import A5
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    width, height = A5
+    pdf = canvas.Canvas(buffer, pagesize=A5, pageCompression=1)
+    pdf.setTitle(f"Receipt {payment['receipt_number']}")
+    pdf.setAuthor(MASJID_NAME)
+
+    y = height - 60
+    pdf.setFont("Helvetica-Bold", 16)
+    pdf.drawCentredString(width / 2, y, MASJID_NAME)
+    y -= 20
+    pdf.setFont("Helvetica", 11)
+    pdf.drawCentredString(width / 2, y, "Payment Receipt")
+    y -= 16
+    pdf.line(40, y, width - 40, y)
+
+    payment_date = payment["payment_date"]
+    if isinstance(payment_date, str):
+        payment_date = datetime.fromisoformat(payment_date)
+    rows = [
+        ("Receipt No.", payment["receipt_number"]),
+        ("Date", payment_date.strftime("%d %b %Y")),
+        ("Member", payment["member_name"]),
+        ("Account No.", payment["member_account_number"]),
+        ("Payment Type", PAYMENT_TYPE_LABELS.get(payment["payment_type"], payment["payment_type"])),
+    ]
+    if payment.get("month_year"):
+        rows.append(("For Month", payment["month_year"]))
+    rows.append(("Payment Method", payment.get("payment_method") or ""))
+    if payment.get("transaction_id"):
+        rows.append(("Transaction ID", payment["transaction_id"]))
+
+    y -= 30
+    for label, value in rows:
+        pdf.setFont("Helvetica-Bold", 10)
+        pdf.drawString(50, y, label)
+        pdf.setFont("Helvetica", 10)
+        pdf.drawString(160, y, str(value))
+        y -= 20
+
+    y -= 6
+    pdf.line(40, y, width - 40, y)
+    y -= 26
+    pdf.setFont("Helvetica-Bold", 13)
+    pdf.drawString(50, y, "Amount Received")
+    pdf.drawRightString(width - 50, y, format_amount(payment["amount"]))
+
+    pdf.setFont("Helvetica-Oblique", 9)
+    pdf.drawCentredString(width / 2, 50, "JazakAllahu Khairan. This is a computer-generated receipt.")
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def render_receipt_file(payment: dict, path: str) -> str:
+    """Render payment's receipt to path; the rename makes a concurrent render of the same receipt harmless"""
+    data = render_receipt(payment)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(data)
+    os.replace(temp_path, path)
+    return path
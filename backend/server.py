@@ -1,32 +1,113 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Header, HTTPException, Query, Request, Response, UploadFile, File
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 import os
+import asyncio
 import logging
+import multiprocessing
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, BeforeValidator, Field, ValidationError
+from typing import Annotated, Awaitable, Callable, List, Literal, Optional, Tuple, get_args
 import uuid
-from datetime import datetime, date
-import requests
+from datetime import datetime, date, timedelta
+from email.utils import formatdate
 import json
+import base64
+import csv
+import hashlib
+import io
+import re
+import tempfile
+import time
+import zlib
+from functools import lru_cache
+import orjson
+from cache import TTLCache, VersionStore, create_response_cache
+from events import EventBroker, RedisEventRelay
+import metrics
+from receipts import render_receipt_file
+from archive import ArchiveFiles, fiscal_year_of, fiscal_year_start, scan_ndjson, write_ndjson_once
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection, opened by each worker process at startup (see connect_db)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+client: Optional[AsyncIOMotorClient] = None
+db = None
+HEALTH_TIMEOUT = float(os.environ.get('HEALTH_TIMEOUT', 2))
+
+# Driver pool and timeout settings; unset variables keep pymongo's defaults
+MONGO_ENV_OPTIONS = {
+    "maxPoolSize": "MONGO_MAX_POOL_SIZE",
+    "minPoolSize": "MONGO_MIN_POOL_SIZE",
+    "maxIdleTimeMS": "MONGO_MAX_IDLE_TIME_MS",
+    "connectTimeoutMS": "MONGO_CONNECT_TIMEOUT_MS",
+    "socketTimeoutMS": "MONGO_SOCKET_TIMEOUT_MS",
+    "serverSelectionTimeoutMS": "MONGO_SERVER_SELECTION_TIMEOUT_MS",
+}
+
+def mongo_options() -> dict:
+    return {option: int(os.environ[name]) for option, name in MONGO_ENV_OPTIONS.items() if os.environ.get(name)}
+
+def connect_db():
+    """Open this process's Mongo client; a client must not be shared across forked workers"""
+    global client, db
+    client = AsyncIOMotorClient(mongo_url, event_listeners=[metrics.MongoCommandMetrics()], **mongo_options())
+    db = client[os.environ['DB_NAME']]
+
+# Whether this process makes every write to the database: true with one uvicorn worker
+# (entrypoint.sh exports WEB_CONCURRENCY). Set SINGLE_WRITER=0 when replicas share the database.
+SINGLE_WRITER = os.environ.get('SINGLE_WRITER', '1' if int(os.environ.get('WEB_CONCURRENCY', 1)) == 1 else '0') == '1'
+
+# Read-through cache for rarely changing responses; shared through Redis when configured
+CACHE_TTL = float(os.environ.get('CACHE_TTL', 300))
+response_cache = create_response_cache(
+    os.environ.get('REDIS_URL'), f"masjid:{os.environ['DB_NAME']}", CACHE_TTL,
+    on_lookup=metrics.record_cache_lookup
+)
+CACHE_ANNOUNCEMENTS = "announcements"
+CACHE_ACTIVE_IMAM = "active_imam"
+CACHE_DASHBOARD_STATS = "dashboard_stats"
+
+# Versions behind the ETag/Last-Modified of polled read routes; bumped by the write handlers.
+# A single writer keeps them in memory; otherwise they live in Redis or the versions
+# collection, never in the per-worker cache, so all workers agree
+versions = VersionStore(
+    os.environ.get('REDIS_URL'), f"masjid:{os.environ['DB_NAME']}:version", lambda: db.versions,
+    shared=not SINGLE_WRITER
+)
+VERSION_PRAYER_TIMES = "prayer_times"
+VERSION_ANNOUNCEMENTS = "announcements"
+VERSION_ACTIVE_IMAM = "active_imam"
+VERSION_MEMBERS = "members"
 
 # Create the main app without a prefix
 app = FastAPI()
 
+# Long-running tasks started at startup and cancelled at shutdown
+background_tasks = set()
+
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 # Pydantic Models
+def blank_to_none(value: Optional[str]) -> Optional[str]:
+    """Forms send '' for an empty optional field; store it as null instead"""
+    if isinstance(value, str):
+        value = value.strip()
+    return value or None
+
+TransactionId = Annotated[Optional[str], BeforeValidator(blank_to_none)]
+MonthYear = Annotated[Optional[str], BeforeValidator(blank_to_none)]
+
 class Member(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     account_number: str = Field(default_factory=lambda: f"MM{str(uuid.uuid4())[:8].upper()}")
@@ -51,26 +132,29 @@ class MemberCreate(BaseModel):
     is_committee_member: bool = False
     committee_position: Optional[str] = None
 
+PaymentType = Literal["monthly_chanda", "ramzan_taravi", "donation"]
+PAYMENT_TYPES = get_args(PaymentType)
+
 class Payment(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     member_id: str
     member_name: str
     member_account_number: str
     amount: float
-    payment_type: str  # monthly_chanda, ramzan_taravi, donation
+    payment_type: PaymentType
     payment_method: str = "UPI"
-    transaction_id: Optional[str] = None
+    transaction_id: TransactionId = None
     receipt_number: str = Field(default_factory=lambda: f"RCP{datetime.now().strftime('%Y%m%d')}{str(uuid.uuid4())[:6].upper()}")
     payment_date: datetime = Field(default_factory=datetime.utcnow)
-    month_year: Optional[str] = None  # For monthly payments like "2025-03"
+    month_year: MonthYear = None  # For monthly payments like "2025-03"
     status: str = "completed"
 
 class PaymentCreate(BaseModel):
     member_id: str
     amount: float
-    payment_type: str
-    transaction_id: Optional[str] = None
-    month_year: Optional[str] = None
+    payment_type: PaymentType
+    transaction_id: TransactionId = None
+    month_year: MonthYear = None
 
 class PrayerTimes(BaseModel):
     date: str
@@ -117,64 +201,1592 @@ class AnnouncementCreate(BaseModel):
     created_by: str
     priority: str = "normal"
 
-# Prayer Times Service
-async def get_prayer_times_from_api():
+# Serialization Fast Path
+# Documents are written from validated models, so read handlers project just the model's
+# fields and encode the raw documents with orjson instead of re-validating them per row.
+def projection(model) -> dict:
+    return {"_id": 0, **{field: 1 for field in model.model_fields}}
+
+MEMBER_PROJECTION = projection(Member)
+PAYMENT_PROJECTION = projection(Payment)
+IMAM_PROJECTION = projection(Imam)
+ANNOUNCEMENT_PROJECTION = projection(Announcement)
+
+# Conditional GET Helpers
+async def check_version(request: Request, name: str, suffix: str = "") -> Tuple[Optional[Response], dict]:
+    """A 304 response if the client's copy of resource name is current, and the validator headers
+
+    suffix distinguishes representations that change without a write, such as today's prayer times.
+    Only If-None-Match is honoured: two writes within one second share a Last-Modified, so
+    If-Modified-Since could confirm a stale copy. Without a readable version the response
+    goes out without validators.
+    """
+    current_version = await versions.get(name)
+    if current_version is None:
+        return None, {}
+    version, modified = current_version
+    etag = f'W/"{name}-{version}{suffix}"'
+    headers = {"ETag": etag, "Last-Modified": formatdate(modified, usegmt=True), "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    current = if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+    return (Response(status_code=304, headers=headers) if current else None), headers
+
+# Keyset Pagination Helpers
+PAGE_SIZE_MAX = 1000
+STREAM_BATCH_SIZE = 500
+
+def encode_cursor(sort_value: datetime, doc_id: str) -> str:
+    """Opaque cursor pointing just past the row with (sort_value, doc_id)"""
+    raw = json.dumps([sort_value.isoformat(), doc_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
     try:
-        # Using Aladhan API for prayer times in Bangalore
-        lat, lon = 12.9715987, 77.5945627  # Ripponpet, Bangalore coordinates
-        url = f"http://api.aladhan.com/v1/timings?latitude={lat}&longitude={lon}&method=4"
-        
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            timings = data['data']['timings']
-            hijri_date = data['data']['date']['hijri']
-            
-            return PrayerTimes(
-                date=datetime.now().strftime('%Y-%m-%d'),
-                hijri_date=f"{hijri_date['date']} {hijri_date['month']['en']} {hijri_date['year']}",
-                fajr=timings['Fajr'],
-                dhuhr=timings['Dhuhr'],
-                asr=timings['Asr'],
-                maghrib=timings['Maghrib'],
-                isha=timings['Isha']
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, doc_id = json.loads(raw)
+        return datetime.fromisoformat(sort_value), str(doc_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_query(base_query: dict, sort_field: str, cursor: Optional[str], descending: bool) -> dict:
+    """Restrict base_query to rows after the cursor in (sort_field, id) order"""
+    if not cursor:
+        return base_query
+    sort_value, doc_id = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+    after = {"$or": [
+        {sort_field: {op: sort_value}},
+        {sort_field: sort_value, "id": {op: doc_id}},
+    ]}
+    return {"$and": [base_query, after]} if base_query else after
+
+async def fetch_page_docs(collection, base_query: dict, sort_field: str, cursor: Optional[str],
+                          limit: int, descending: bool, fields: dict) -> Tuple[List[dict], Optional[str]]:
+    """One keyset page of documents and the cursor for the next page, if there is one"""
+    direction = -1 if descending else 1
+    docs = await collection.find(
+        keyset_query(base_query, sort_field, cursor, descending), fields
+    ).sort([(sort_field, direction), ("id", direction)]).limit(limit + 1).to_list(limit + 1)
+
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    return docs, encode_cursor(docs[-1][sort_field], docs[-1]["id"])
+
+async def fetch_page(collection, base_query: dict, sort_field: str, cursor: Optional[str],
+                     limit: int, descending: bool, fields: dict) -> ORJSONResponse:
+    """Fetch one keyset page; the next cursor is returned in the X-Next-Cursor header"""
+    docs, next_cursor = await fetch_page_docs(collection, base_query, sort_field, cursor, limit, descending, fields)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return ORJSONResponse(docs, headers=headers)
+
+def stream_ndjson(collection, base_query: dict, sort_field: str, cursor: Optional[str],
+                  descending: bool, fields: dict) -> StreamingResponse:
+    """Stream every matching row as NDJSON, reading the Motor cursor in batches"""
+    direction = -1 if descending else 1
+    query = keyset_query(base_query, sort_field, cursor, descending)
+
+    async def rows():
+        docs = collection.find(query, fields, batch_size=STREAM_BATCH_SIZE).sort(
+            [(sort_field, direction), ("id", direction)]
+        )
+        async for doc in docs:
+            yield orjson.dumps(doc) + b"\n"
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+# Idempotency Keys
+# A client that retries a POST with the same Idempotency-Key header gets the first
+# attempt's response back instead of creating a second document. Keys live in
+# idempotency_keys, one row per (scope, key), until the TTL index expires them.
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', 24 * 3600))
+# A key left pending this long belongs to a request that died and may be taken over
+IDEMPOTENCY_PENDING_TIMEOUT = 60
+IDEMPOTENCY_KEY_HEADER = Header(None, alias="Idempotency-Key", min_length=1, max_length=255)
+
+# Passed to create handlers, which call it with their result as soon as their insert succeeds
+RecordResult = Callable[[BaseModel], Awaitable[None]]
+
+async def no_record(result: BaseModel):
+    pass
+
+async def idempotent(scope: str, key: Optional[str], body: BaseModel, response: Response,
+                     create: Callable[[RecordResult], Awaitable[BaseModel]]):
+    """Run create(record) at most once per (scope, key) and replay its result to retries
+
+    The result is stored as soon as create records it, so a failure in the work that
+    follows the insert (rollups, events) can't free the key for a second insert.
+    """
+    if key is None:
+        return await create(no_record)
+
+    fingerprint = hashlib.sha256(body.model_dump_json().encode()).hexdigest()
+    selector = {"scope": scope, "key": key}
+    # Retries are answered from this one indexed lookup and write nothing
+    stored = await db.idempotency_keys.find_one(selector, {"_id": 0})
+    if stored is None:
+        try:
+            await db.idempotency_keys.insert_one(
+                {**selector, "fingerprint": fingerprint, "response": None, "created_at": datetime.utcnow()}
             )
-    except Exception as e:
-        logging.error(f"Error fetching prayer times: {e}")
-        # Return default times if API fails
-        return PrayerTimes(
-            date=datetime.now().strftime('%Y-%m-%d'),
-            hijri_date="",
-            fajr="05:30",
-            dhuhr="12:30",
-            asr="16:00",
-            maghrib="18:30",
-            isha="19:45"
+        except DuplicateKeyError:
+            # A concurrent attempt with the same key got there first
+            stored = await db.idempotency_keys.find_one(selector, {"_id": 0})
+
+    if stored is not None:
+        if stored["fingerprint"] != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        if stored["response"] is not None:
+            response.headers["Idempotent-Replayed"] = "true"
+            return stored["response"]
+        stale = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_PENDING_TIMEOUT)
+        taken = await db.idempotency_keys.update_one(
+            {**selector, "response": None, "created_at": {"$lt": stale}}, {"$set": {"created_at": datetime.utcnow()}}
+        )
+        if not taken.modified_count:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+
+    recorded = False
+
+    async def record(result: BaseModel):
+        nonlocal recorded
+        # Set first: once the insert has happened the key must never be released
+        recorded = True
+        # Stored JSON-encoded, so a replay is byte-for-byte the original response
+        await db.idempotency_keys.update_one(selector, {"$set": {"response": result.model_dump(mode="json")}})
+
+    try:
+        result = await create(record)
+    except Exception:
+        if not recorded:
+            # Nothing was written, so the client may retry
+            await db.idempotency_keys.delete_one(selector)
+        raise
+    if not recorded:
+        await record(result)
+    return result
+
+# MongoDB Indexes
+# Only real transaction ids are unique; payments without one store null
+TRANSACTION_ID_FILTER = {"transaction_id": {"$gt": ""}}
+
+INDEX_SPECS = {
+    "members": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("account_number", ASCENDING)], unique=True, name="account_number_unique"),
+        IndexModel([("is_active", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="active_created"),
+        IndexModel([("is_active", ASCENDING), ("is_committee_member", ASCENDING)], name="active_committee"),
+        IndexModel([("phone", ASCENDING), ("id_proof_number", ASCENDING)], name="phone_id_proof"),
+        IndexModel([("name_tokens", ASCENDING)], name="name_tokens"),
+        IndexModel([("archive_batch", ASCENDING)], sparse=True, name="archive_batch"),
+    ],
+    "payments": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("receipt_number", ASCENDING)], unique=True, name="receipt_number_unique"),
+        IndexModel([("payment_date", DESCENDING), ("id", DESCENDING)], name="payment_date"),
+        IndexModel([("member_id", ASCENDING), ("payment_date", DESCENDING)], name="member_payment_date"),
+        IndexModel([("month_year", ASCENDING)], name="month_year"),
+        IndexModel([("archive_batch", ASCENDING)], sparse=True, name="archive_batch"),
+        IndexModel(
+            [("transaction_id", ASCENDING)], unique=True, name="transaction_id_unique",
+            partialFilterExpression=TRANSACTION_ID_FILTER
+        ),
+    ],
+    "payment_rollups": [
+        IndexModel([("month", ASCENDING), ("payment_type", ASCENDING)], unique=True, name="month_type_unique"),
+    ],
+    "chanda_coverage": [
+        IndexModel([("member_id", ASCENDING), ("year", ASCENDING)], unique=True, name="member_year_unique"),
+        IndexModel([("year", ASCENDING)], name="year"),
+    ],
+    "payment_daily_rollups": [
+        IndexModel([("day", ASCENDING), ("payment_type", ASCENDING)], unique=True, name="day_type_unique"),
+    ],
+    "donor_rollups": [
+        IndexModel([("member_id", ASCENDING), ("year", ASCENDING)], unique=True, name="member_year_unique"),
+        IndexModel([("year", ASCENDING), ("total", DESCENDING)], name="year_total"),
+    ],
+    "payments_archive": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("payment_date", DESCENDING), ("id", DESCENDING)], name="payment_date"),
+        IndexModel([("member_id", ASCENDING), ("payment_date", DESCENDING)], name="member_payment_date"),
+    ],
+    "members_archive": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+    ],
+    "payment_archive_files": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("file", ASCENDING)], name="file"),
+    ],
+    "payment_archive_summaries": [
+        IndexModel(
+            [("member_id", ASCENDING), ("payment_date", ASCENDING), ("month_year", ASCENDING), ("payment_type", ASCENDING)],
+            unique=True, name="period_unique"
+        ),
+    ],
+    "idempotency_keys": [
+        IndexModel([("scope", ASCENDING), ("key", ASCENDING)], unique=True, name="scope_key_unique"),
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=IDEMPOTENCY_TTL, name="created_at_ttl"),
+    ],
+    "prayer_times": [
+        IndexModel([("date", ASCENDING)], unique=True, name="date_unique"),
+    ],
+    "imams": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("is_active", ASCENDING)], name="active"),
+    ],
+    "announcements": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("is_active", ASCENDING), ("created_at", DESCENDING)], name="active_created"),
+    ],
+}
+
+# Representative query shapes issued by the handlers, checked by the index audit
+AUDIT_QUERIES = [
+    ("members", "get_member", {"id": "", "is_active": True}, None),
+    ("members", "get_members", {"is_active": True}, [("created_at", ASCENDING), ("id", ASCENDING)]),
+    ("members", "search_members", {"name_tokens": {"$regex": "^a"}, "is_active": True}, None),
+    ("members", "dashboard_committee", {"is_active": True, "is_committee_member": True}, None),
+    ("payments", "get_payments", {}, [("payment_date", DESCENDING), ("id", DESCENDING)]),
+    ("payments", "get_member_payments", {"member_id": ""}, [("payment_date", DESCENDING)]),
+    ("payments", "dashboard_monthly", {"month_year": ""}, None),
+    ("payment_rollups", "get_monthly_report", {"month": {"$gte": "2025-", "$lt": "2026-"}}, None),
+    ("payment_daily_rollups", "get_trends_report", {"day": {"$gte": "", "$lte": ""}}, None),
+    ("donor_rollups", "get_top_donors", {"year": 0}, None),
+    ("prayer_times", "get_prayer_times", {"date": ""}, None),
+    ("imams", "get_active_imam", {"is_active": True}, None),
+    ("announcements", "get_announcements", {"is_active": True}, [("created_at", DESCENDING)]),
+]
+
+async def migrate_transaction_id_index():
+    """Null out blank transaction ids and drop a transaction_id_unique built with an older filter
+
+    Blank ids used to be stored as '' and covered by the index, so existing duplicates of ''
+    would keep the index from being created. Does nothing once the current index exists.
+    """
+    current = (await db.payments.index_information()).get("transaction_id_unique")
+    if current and current.get("partialFilterExpression") == TRANSACTION_ID_FILTER:
+        return
+    result = await db.payments.update_many(
+        {"transaction_id": {"$type": "string", "$regex": r"^\s*$"}}, {"$set": {"transaction_id": None}}
+    )
+    if result.modified_count:
+        logger.info(f"Cleared {result.modified_count} blank transaction ids")
+    if current:
+        await db.payments.drop_index("transaction_id_unique")
+
+    # Real duplicates need a person to look at them; until then the index can't be built
+    duplicates = await db.payments.aggregate([
+        {"$match": TRANSACTION_ID_FILTER},
+        {"$group": {"_id": "$transaction_id", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": 10},
+    ]).to_list(None)
+    if duplicates:
+        logger.error(
+            "transaction_id_unique cannot be built while payments share a transaction id, so concurrent "
+            f"imports may record a transaction twice. Duplicated ids include: {[row['_id'] for row in duplicates]}"
+        )
+
+async def ensure_indexes():
+    """Create all indexes in INDEX_SPECS; safe to run on every startup"""
+    for collection_name, indexes in INDEX_SPECS.items():
+        # One at a time, so an index blocked by existing duplicates doesn't block the rest
+        for index in indexes:
+            try:
+                await db[collection_name].create_indexes([index])
+            except OperationFailure as e:
+                logging.error(f"Error creating index {index.document['name']} on {collection_name}: {e}")
+
+# Member Search
+# Members carry a lowercased name_tokens array so name prefixes are matched through an
+# index; phone is matched exactly and account_number by prefix through their own indexes.
+SEARCH_LIMIT_MAX = 100
+ACCOUNT_PREFIX_MIN = 3
+
+def account_prefix(q: str) -> Optional[str]:
+    """The account number prefix a query is looked up by, or None when it reads as a name"""
+    # Every account number starts with MM, so a query without a digit would match everyone
+    prefix = q.upper()
+    if len(prefix) < ACCOUNT_PREFIX_MIN or not any(char.isdigit() for char in prefix):
+        return None
+    return prefix
+
+def name_tokens(name: str) -> List[str]:
+    return name.lower().split()
+
+def member_doc(member: Member) -> dict:
+    return {**member.dict(), "name_tokens": name_tokens(member.name)}
+
+async def backfill_member_search():
+    """Add name_tokens to members written before search existed"""
+    result = await db.members.update_many({"name_tokens": {"$exists": False}}, [
+        {"$set": {"name_tokens": {"$filter": {
+            "input": {"$split": [{"$toLower": "$name"}, " "]},
+            "cond": {"$ne": ["$$this", ""]},
+        }}}}
+    ])
+    return result.modified_count
+
+# Fuzzy matching only looks at this many candidates, fetched with just the fields ranking needs
+FUZZY_CANDIDATES_MAX = 100
+FUZZY_CANDIDATE_FIELDS = {"_id": 0, "id": 1, "name": 1, "name_tokens": 1}
+
+@lru_cache(maxsize=8192)
+def edit_distance(a: str, b: str) -> int:
+    # Cached: candidates share a handful of spellings, e.g. mohamed, mohammed and muhammad
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+def name_score(tokens: List[str], query_tokens: List[str]) -> Optional[float]:
+    """Rank a member's name against the query, or None when it doesn't match"""
+    score = 0.0
+    for query_token in query_tokens:
+        if query_token in tokens:
+            score += 3
+        elif any(token.startswith(query_token) for token in tokens):
+            score += 2
+        else:
+            allowed = 1 if len(query_token) <= 4 else 2
+            # A token this much shorter than the query word can't be within `allowed` edits
+            lengths_ok = [token for token in tokens if len(token) >= len(query_token) - allowed]
+            if not lengths_ok:
+                return None
+            distance = min(edit_distance(query_token, token[:len(query_token) + allowed]) for token in lengths_ok)
+            if distance > allowed:
+                return None
+            score += 1 - distance / (allowed + 1)
+    # Prefer names that start with the query and shorter, closer names
+    if " ".join(tokens).startswith(" ".join(query_tokens)):
+        score += 1
+    return score / len(query_tokens) - len(tokens) * 0.01
+
+# Member Directory
+# Each worker keeps the few member fields a payment copies, keyed by id, so creating a
+# payment needs no members round trip. Local writes update it immediately, so a single
+# writer (see SINGLE_WRITER) always trusts it. Other workers hear of renames and deletions
+# from the change stream or the Redis event relay (see Live Events). Without either, a worker
+# can't know another deactivated a member, so lookups go to Mongo and is_active stays
+# authoritative. A periodic reload is a backstop.
+MEMBER_DIRECTORY_FIELDS = {"_id": 0, "id": 1, "name": 1, "account_number": 1}
+MEMBER_DIRECTORY_REFRESH = 300
+MEMBER_DIRECTORY_EVENT = "member_directory"
+
+class MemberDirectory:
+    def __init__(self, shared: Callable[[], bool]):
+        self._members = {}
+        # Whether every member write, this worker's or another's, reaches this directory
+        self.shared = shared
+
+    async def load(self):
+        members = {}
+        async for member in db.members.find({"is_active": True}, MEMBER_DIRECTORY_FIELDS, batch_size=STREAM_BATCH_SIZE):
+            members[member["id"]] = member
+        self._members = members
+
+    def put(self, member: dict):
+        if member.get("is_active", True):
+            self._members[member["id"]] = {field: member[field] for field in ("id", "name", "account_number")}
+        else:
+            self.remove(member["id"])
+
+    def remove(self, member_id: str):
+        self._members.pop(member_id, None)
+
+    async def get(self, member_id: str) -> Optional[dict]:
+        member = self._members.get(member_id) if self.shared() else None
+        if member is None:
+            self.remove(member_id)
+            member = await db.members.find_one({"id": member_id, "is_active": True}, MEMBER_DIRECTORY_FIELDS)
+            if member:
+                self._members[member_id] = member
+        return member
+
+member_directory = MemberDirectory(lambda: SINGLE_WRITER or change_stream_active or event_relay is not None)
+
+async def member_changed(member: dict):
+    """Update this worker's directory and, unless the change stream will, every other worker's"""
+    member_directory.put(member)
+    if event_relay and not change_stream_active:
+        fields = {field: member[field] for field in ("id", "name", "account_number", "is_active")}
+        try:
+            await event_relay.publish(MEMBER_DIRECTORY_EVENT, fields)
+        except Exception as e:
+            logger.error(f"Event relay publish failed: {e}")
+
+async def refresh_member_directory_forever():
+    while True:
+        await asyncio.sleep(MEMBER_DIRECTORY_REFRESH)
+        try:
+            await member_directory.load()
+        except Exception as e:
+            logger.error(f"Error loading member directory: {e}")
+
+# Renames are copied onto historical payments in the background, batching renames
+# that arrive close together into one bulk_write. The name copied is re-read from members,
+# so the latest rename wins whichever worker queued it. Each rename is applied a second time
+# a little later, for payments another worker created from the old name in the meantime.
+MEMBER_RENAME_RECHECK_SECONDS = 10
+member_renames: "asyncio.Queue[Tuple[str, bool]]" = asyncio.Queue()
+
+async def fan_out_member_renames_forever():
+    while True:
+        member_id, recheck = await member_renames.get()
+        renamed = {member_id: recheck}
+        while not member_renames.empty():
+            member_id, recheck = member_renames.get_nowait()
+            renamed[member_id] = renamed.get(member_id, False) or recheck
+        try:
+            names = {
+                member["id"]: member["name"]
+                async for member in db.members.find({"id": {"$in": list(renamed)}}, {"_id": 0, "id": 1, "name": 1})
+            }
+            if names:
+                result = await db.payments.bulk_write([
+                    UpdateMany({"member_id": member_id, "member_name": {"$ne": name}}, {"$set": {"member_name": name}})
+                    for member_id, name in names.items()
+                ], ordered=False)
+                logger.info(f"Renamed {len(names)} members on {result.modified_count} payments")
+                if result.modified_count:
+                    await dashboard_changed()
+        except Exception as e:
+            logger.error(f"Error updating member names on payments: {e}")
+        for member_id, recheck in renamed.items():
+            if recheck:
+                asyncio.get_running_loop().call_later(
+                    MEMBER_RENAME_RECHECK_SECONDS, member_renames.put_nowait, (member_id, False)
+                )
+
+# Payment Rollups
+# payment_rollups holds one {month, payment_type, total, count} row per month and type.
+# Payments roll up under their month_year, or the month of payment_date when unset or blank.
+# Rebuilds and payment_month() must agree: null and "" both sort below any non-empty string.
+ROLLUP_MONTH_EXPR = {"$cond": [
+    {"$gt": ["$month_year", ""]},
+    "$month_year",
+    {"$dateToString": {"format": "%Y-%m", "date": "$payment_date"}},
+]}
+# Rebuilds read archived payments through their summary rows (see Archival), which carry
+# an amount total and a count instead of one document per payment.
+ARCHIVED_PAYMENTS_STAGE = {"$unionWith": {
+    "coll": "payment_archive_summaries", "pipeline": [{"$project": {"_id": 0, "batches": 0}}]
+}}
+PAYMENT_COUNT_EXPR = {"$ifNull": ["$count", 1]}
+
+def payment_month(payment: dict) -> str:
+    return payment.get("month_year") or payment["payment_date"].strftime('%Y-%m')
+
+async def record_payment_rollups(payments: List[dict]):
+    increments = {}
+    for payment in payments:
+        key = (payment_month(payment), payment["payment_type"])
+        total, count = increments.get(key, (0, 0))
+        increments[key] = (total + payment["amount"], count + 1)
+    if not increments:
+        return
+    await db.payment_rollups.bulk_write([
+        UpdateOne(
+            {"month": month, "payment_type": payment_type},
+            {"$inc": {"total": total, "count": count}},
+            upsert=True
+        )
+        for (month, payment_type), (total, count) in increments.items()
+    ], ordered=False)
+
+async def rebuild_payment_rollups():
+    """Recompute payment_rollups from scratch; $out swaps the collection in atomically"""
+    await db.payments.aggregate([
+        ARCHIVED_PAYMENTS_STAGE,
+        {"$group": {
+            "_id": {"month": ROLLUP_MONTH_EXPR, "payment_type": "$payment_type"},
+            "total": {"$sum": "$amount"},
+            "count": {"$sum": PAYMENT_COUNT_EXPR},
+        }},
+        {"$project": {
+            "_id": 0,
+            "month": "$_id.month",
+            "payment_type": "$_id.payment_type",
+            "total": 1,
+            "count": 1,
+        }},
+        {"$out": "payment_rollups"},
+    ]).to_list(None)
+    await db.payment_rollups.create_indexes(INDEX_SPECS["payment_rollups"])
+    return await db.payment_rollups.count_documents({})
+
+# Monthly Chanda Coverage
+# chanda_coverage holds one {member_id, year, months} row per member and year, where bit
+# (month - 1) of months is set once a monthly_chanda payment for that month_year is recorded.
+def parse_month_year(month_year: Optional[str]) -> Optional[Tuple[int, int]]:
+    try:
+        year, month = map(int, month_year.split("-"))
+    except (AttributeError, ValueError):
+        return None
+    return (year, month) if 1 <= month <= 12 else None
+
+def recent_months(count: int, until: Optional[date] = None) -> List[Tuple[int, int]]:
+    """The last `count` (year, zero-based month) pairs, oldest first, ending with the month of `until`"""
+    until = until or date.today()
+    index = until.year * 12 + until.month - 1
+    return [divmod(i, 12) for i in range(index - count + 1, index + 1)]
+
+def month_label(year: int, month: int) -> str:
+    return f"{year:04d}-{month + 1:02d}"
+
+async def record_chanda_coverage(payments: List[dict]):
+    bits = {}
+    for payment in payments:
+        parsed = parse_month_year(payment.get("month_year"))
+        if payment["payment_type"] != "monthly_chanda" or not parsed:
+            continue
+        key = (payment["member_id"], parsed[0])
+        bits[key] = bits.get(key, 0) | 1 << (parsed[1] - 1)
+    if not bits:
+        return
+    await db.chanda_coverage.bulk_write([
+        UpdateOne({"member_id": member_id, "year": year}, {"$bit": {"months": {"or": months}}}, upsert=True)
+        for (member_id, year), months in bits.items()
+    ], ordered=False)
+
+async def rebuild_chanda_coverage():
+    """Recompute chanda_coverage from all monthly_chanda payments"""
+    bits = {}
+    async for row in db.payments.aggregate([
+        ARCHIVED_PAYMENTS_STAGE,
+        {"$match": {"payment_type": "monthly_chanda", "month_year": {"$type": "string"}}},
+        {"$group": {"_id": {"member_id": "$member_id", "month_year": "$month_year"}}},
+    ]):
+        parsed = parse_month_year(row["_id"]["month_year"])
+        if parsed:
+            key = (row["_id"]["member_id"], parsed[0])
+            bits[key] = bits.get(key, 0) | 1 << (parsed[1] - 1)
+
+    await db.chanda_coverage.delete_many({})
+    if bits:
+        await db.chanda_coverage.insert_many([
+            {"member_id": member_id, "year": year, "months": months}
+            for (member_id, year), months in bits.items()
+        ])
+    return len(bits)
+
+# Report Rollups
+# payment_daily_rollups holds one {day, payment_type, total, count} row per payment_date day
+# and type. donor_rollups holds one {member_id, year, total, count, by_type} row per member
+# and year, where by_type maps each payment_type to its {total, count}; the year is that of
+# month_year, or of payment_date when month_year is unset or not in YYYY-MM form.
+ROLLUP_YEAR_EXPR = {"$cond": [
+    {"$regexMatch": {"input": {"$ifNull": ["$month_year", ""]}, "regex": "^[0-9]{4}-[0-9]{1,2}$"}},
+    {"$toInt": {"$substrBytes": ["$month_year", 0, 4]}},
+    {"$year": "$payment_date"},
+]}
+
+def payment_year(payment: dict) -> int:
+    parsed = parse_month_year(payment.get("month_year"))
+    return parsed[0] if parsed else payment["payment_date"].year
+
+async def record_daily_rollups(payments: List[dict]):
+    increments = {}
+    for payment in payments:
+        key = (payment["payment_date"].strftime('%Y-%m-%d'), payment["payment_type"])
+        total, count = increments.get(key, (0, 0))
+        increments[key] = (total + payment["amount"], count + 1)
+    if not increments:
+        return
+    await db.payment_daily_rollups.bulk_write([
+        UpdateOne(
+            {"day": day, "payment_type": payment_type},
+            {"$inc": {"total": total, "count": count}},
+            upsert=True
+        )
+        for (day, payment_type), (total, count) in increments.items()
+    ], ordered=False)
+
+async def record_donor_rollups(payments: List[dict]):
+    increments = {}
+    for payment in payments:
+        inc = increments.setdefault((payment["member_id"], payment_year(payment)), {})
+        for field, value in (
+            ("total", payment["amount"]),
+            ("count", 1),
+            (f"by_type.{payment['payment_type']}.total", payment["amount"]),
+            (f"by_type.{payment['payment_type']}.count", 1),
+        ):
+            inc[field] = inc.get(field, 0) + value
+    if not increments:
+        return
+    await db.donor_rollups.bulk_write([
+        UpdateOne({"member_id": member_id, "year": year}, {"$inc": inc}, upsert=True)
+        for (member_id, year), inc in increments.items()
+    ], ordered=False)
+
+async def rebuild_daily_rollups():
+    """Recompute payment_daily_rollups from scratch"""
+    await db.payments.aggregate([
+        ARCHIVED_PAYMENTS_STAGE,
+        {"$group": {
+            "_id": {"day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$payment_date"}}, "payment_type": "$payment_type"},
+            "total": {"$sum": "$amount"},
+            "count": {"$sum": PAYMENT_COUNT_EXPR},
+        }},
+        {"$project": {
+            "_id": 0,
+            "day": "$_id.day",
+            "payment_type": "$_id.payment_type",
+            "total": 1,
+            "count": 1,
+        }},
+        {"$out": "payment_daily_rollups"},
+    ]).to_list(None)
+    await db.payment_daily_rollups.create_indexes(INDEX_SPECS["payment_daily_rollups"])
+    return await db.payment_daily_rollups.count_documents({})
+
+async def rebuild_donor_rollups():
+    """Recompute donor_rollups from scratch"""
+    await db.payments.aggregate([
+        ARCHIVED_PAYMENTS_STAGE,
+        {"$group": {
+            "_id": {"member_id": "$member_id", "year": ROLLUP_YEAR_EXPR, "payment_type": "$payment_type"},
+            "total": {"$sum": "$amount"},
+            "count": {"$sum": PAYMENT_COUNT_EXPR},
+        }},
+        {"$group": {
+            "_id": {"member_id": "$_id.member_id", "year": "$_id.year"},
+            "total": {"$sum": "$total"},
+            "count": {"$sum": "$count"},
+            "by_type": {"$push": {"k": "$_id.payment_type", "v": {"total": "$total", "count": "$count"}}},
+        }},
+        {"$project": {
+            "_id": 0,
+            "member_id": "$_id.member_id",
+            "year": "$_id.year",
+            "total": 1,
+            "count": 1,
+            "by_type": {"$arrayToObject": "$by_type"},
+        }},
+        {"$out": "donor_rollups"},
+    ]).to_list(None)
+    await db.donor_rollups.create_indexes(INDEX_SPECS["donor_rollups"])
+    return await db.donor_rollups.count_documents({})
+
+async def record_payment_aggregates(payments: List[dict]):
+    """Apply newly inserted payments to every incrementally maintained aggregate"""
+    await asyncio.gather(
+        record_payment_rollups(payments),
+        record_chanda_coverage(payments),
+        record_daily_rollups(payments),
+        record_donor_rollups(payments),
+    )
+
+def plan_stages(plan: dict) -> List[str]:
+    """Flatten an explain() winning plan into its list of stage names"""
+    if "queryPlan" in plan:  # slot-based engine wraps the classic plan
+        plan = plan["queryPlan"]
+    stages = [plan.get("stage", "")]
+    for key in ("inputStage", "outerStage", "innerStage"):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+# Bulk Import Helpers
+BULK_BATCH_SIZE = 500
+
+def iter_upload_rows(upload: UploadFile, on_unreadable: Callable[[int, str], None]):
+    """Yield (row_number, dict) from a CSV or NDJSON upload without reading it all into memory
+
+    A file that stops being readable (not UTF-8, malformed CSV) ends the rows early: the rows
+    before it are still yielded, and on_unreadable gets the row it failed at and why.
+    """
+    # Decoded a line at a time, so a bad byte fails its own row rather than a whole read-ahead chunk
+    text = (line.decode("utf-8-sig" if index == 0 else "utf-8") for index, line in enumerate(upload.file))
+    name = (upload.filename or "").lower()
+    row_number = 0
+    try:
+        if name.endswith((".ndjson", ".jsonl")) or upload.content_type == "application/x-ndjson":
+            for row_number, line in enumerate(text, start=1):
+                if line.strip():
+                    yield row_number, line
+        else:
+            for row_number, row in enumerate(csv.DictReader(text), start=1):
+                # Blank CSV cells mean "not provided", not an empty value
+                yield row_number, {key: value for key, value in row.items() if key and value not in ("", None)}
+    except UnicodeDecodeError:
+        on_unreadable(row_number + 1, "File is not UTF-8 text from this row on; save it as UTF-8 (CSV UTF-8 in Excel)")
+    except csv.Error as e:
+        on_unreadable(row_number + 1, f"Malformed CSV from this row on: {e}")
+
+def validation_errors(exc: Exception) -> List[dict]:
+    if isinstance(exc, ValidationError):
+        return [{"field": ".".join(map(str, error["loc"])) or None, "message": error["msg"]} for error in exc.errors()]
+    return [{"field": None, "message": str(exc)}]
+
+def parse_row(model, row):
+    if isinstance(row, str):
+        return model.model_validate_json(row)
+    return model(**row)
+
+# Statement Reconciliation Helpers
+# Accepted column names in UPI/bank statement exports, after normalize_column()
+STATEMENT_COLUMNS = {
+    "transaction_id": ("transaction_id", "utr", "utr_no", "upi_ref_no", "reference_no", "ref_no"),
+    "amount": ("amount", "credit", "credit_amount", "deposit"),
+    "payment_date": ("payment_date", "date", "transaction_date", "txn_date", "value_date"),
+    "member_id": ("member_id",),
+    "account_number": ("account_number", "member_account_number"),
+    "phone": ("phone", "mobile", "payer_mobile"),
+    "remarks": ("remarks", "narration", "description", "note"),
+    "payment_type": ("payment_type",),
+    "month_year": ("month_year",),
+}
+STATEMENT_DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%d/%m/%y", "%d-%b-%Y", "%d %b %Y", "%Y-%m-%d %H:%M:%S")
+ACCOUNT_NUMBER_PATTERN = re.compile(r"\bMM[0-9A-F]{8}\b")
+
+def normalize_column(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", name.strip().lower()).strip("_")
+
+def normalize_statement_row(row: dict) -> dict:
+    row = {normalize_column(key): str(value).strip() for key, value in row.items() if value not in ("", None)}
+    normalized = {}
+    for field, aliases in STATEMENT_COLUMNS.items():
+        for alias in aliases:
+            if row.get(alias):
+                normalized[field] = row[alias]
+                break
+
+    # Payers are asked to put their account number in the UPI note
+    if "account_number" not in normalized:
+        match = ACCOUNT_NUMBER_PATTERN.search(normalized.get("remarks", "").upper())
+        if match:
+            normalized["account_number"] = match.group(0)
+    return normalized
+
+def parse_statement_line(line: str) -> dict:
+    try:
+        row = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e.msg}")
+    if not isinstance(row, dict):
+        raise ValueError("Expected a JSON object")
+    return row
+
+def parse_statement_amount(value: str) -> float:
+    amount = float(value.replace(",", "").replace("₹", "").replace("INR", "").strip())
+    if amount <= 0:
+        raise ValueError("Not a credit")
+    return amount
+
+def parse_statement_date(value: str) -> datetime:
+    for date_format in STATEMENT_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date '{value}'")
+
+# Export Helpers
+EXPORT_FLUSH_ROWS = 500
+
+def export_query(date_field: str, from_date: Optional[date], to_date: Optional[date], **filters) -> dict:
+    query = {key: value for key, value in filters.items() if value is not None}
+    date_range = {}
+    if from_date:
+        date_range["$gte"] = datetime.combine(from_date, datetime.min.time())
+    if to_date:
+        date_range["$lt"] = datetime.combine(to_date + timedelta(days=1), datetime.min.time())
+    if date_range:
+        query[date_field] = date_range
+    return query
+
+def export_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return "" if value is None else value
+
+async def iter_csv(docs, fields: List[str]):
+    """Encode a Motor cursor as CSV in chunks of EXPORT_FLUSH_ROWS rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    rows = 0
+    async for doc in docs:
+        writer.writerow([export_value(doc.get(field)) for field in fields])
+        rows += 1
+        if rows % EXPORT_FLUSH_ROWS == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+async def iter_gzip(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+async def export_response(collection, query: dict, sort: list, fields: List[str], name: str,
+                          format: str, gzip: bool):
+    docs = collection.find(query, {"_id": 0}, batch_size=STREAM_BATCH_SIZE).sort(sort)
+
+    if format == "xlsx":
+        import xlsxwriter
+
+        # XLSX is a zip archive, so it is assembled in a temp file before being sent
+        fd, path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        try:
+            workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+            sheet = workbook.add_worksheet(name)
+            sheet.write_row(0, 0, fields)
+            row = 0
+            async for doc in docs:
+                row += 1
+                sheet.write_row(row, 0, [export_value(doc.get(field)) for field in fields])
+            await asyncio.to_thread(workbook.close)
+        except BaseException:
+            # Also on cancellation, so an abandoned export does not leave its file behind
+            os.remove(path)
+            raise
+        return FileResponse(
+            path, filename=f"{name}.xlsx", background=BackgroundTask(os.remove, path),
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
 
+    body = iter_csv(docs, fields)
+    filename = f"{name}.csv"
+    media_type = "text/csv"
+    if gzip:
+        body = iter_gzip(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# Archival
+# Payments dated before a fiscal year and soft-deleted members move out of the hot
+# collections, either into payments_archive/members_archive or into gzipped NDJSON files
+# under ARCHIVE_DIR. Each archived payment leaves its amount in payment_archive_summaries,
+# one row per member, day, month_year and payment_type, so every rollup can still be
+# rebuilt. The rollups themselves are left alone: archived periods keep reporting as before.
+# Archival goes in batches tagged with an archive_batch id before anything is copied. The
+# tag makes each step safe to repeat: a rerun resumes a tagged batch, summary rows list the
+# batches already counted in them, and NDJSON batch files are never written twice.
+# Receipts are still served for archived payments (see get_receipt); the receipts ZIP
+# covers hot payments only. payment_archive_files maps each payment id written to NDJSON to
+# its file, so a receipt lookup reads one file, and an unknown id none.
+FISCAL_YEAR_START_MONTH = int(os.environ.get('FISCAL_YEAR_START_MONTH', 4))  # April
+ARCHIVE_KEEP_FISCAL_YEARS = int(os.environ.get('ARCHIVE_KEEP_FISCAL_YEARS', 2))
+ARCHIVE_TARGET = os.environ.get('ARCHIVE_TARGET', 'collection')  # or "ndjson"
+ARCHIVE_BATCH_SIZE = 1000
+archive_files = ArchiveFiles(os.environ.get('ARCHIVE_DIR', ROOT_DIR / 'archived'))
+
+def default_archive_fiscal_year() -> int:
+    """The oldest fiscal year kept hot: the current one and ARCHIVE_KEEP_FISCAL_YEARS - 1 before it"""
+    return fiscal_year_of(datetime.now(), FISCAL_YEAR_START_MONTH) - ARCHIVE_KEEP_FISCAL_YEARS + 1
+
+async def copy_to_archive_collection(collection, docs: List[dict]) -> List[dict]:
+    """Insert docs into an archive collection; returns the ones not already archived by an earlier run"""
+    try:
+        await collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        duplicates = {error["index"] for error in e.details["writeErrors"] if error["code"] == 11000}
+        if len(duplicates) < len(e.details["writeErrors"]):
+            raise
+        docs = [doc for index, doc in enumerate(docs) if index not in duplicates]
+    for doc in docs:
+        doc.pop("_id", None)
+    return docs
+
+async def record_archive_summaries(batch_id: str, payments: List[dict]):
+    """Add a batch's payments to their summary rows, unless the batch was counted already"""
+    increments = {}
+    for payment in payments:
+        day = datetime.combine(payment["payment_date"].date(), datetime.min.time())
+        key = (payment["member_id"], day, payment.get("month_year"), payment["payment_type"])
+        total, count = increments.get(key, (0, 0))
+        increments[key] = (total + payment["amount"], count + 1)
+    if not increments:
+        return
+    try:
+        await db.payment_archive_summaries.bulk_write([
+            UpdateOne(
+                {"member_id": member_id, "payment_date": day, "month_year": month_year,
+                 "payment_type": payment_type, "batches": {"$ne": batch_id}},
+                {"$inc": {"amount": total, "count": count}, "$addToSet": {"batches": batch_id}},
+                upsert=True
+            )
+            for (member_id, day, month_year, payment_type), (total, count) in increments.items()
+        ], ordered=False)
+    except BulkWriteError as e:
+        # A row that already lists the batch fails its upsert on period_unique: already counted
+        if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+            raise
+
+async def index_archive_file(name: str, payment_ids: List[str]):
+    """Record which NDJSON file holds each payment; ids indexed by an earlier run are skipped"""
+    if not payment_ids:
+        return
+    try:
+        await db.payment_archive_files.insert_many(
+            [{"id": payment_id, "file": name} for payment_id in payment_ids], ordered=False
+        )
+    except BulkWriteError as e:
+        if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+            raise
+
+async def backfill_payment_archive_files():
+    """Index NDJSON payment files written before payment_archive_files existed"""
+    indexed = set(await db.payment_archive_files.distinct("file"))
+    for path in archive_files.payment_files():
+        if path.name not in indexed:
+            ids = await asyncio.to_thread(lambda: [payment["id"] for payment in scan_ndjson([path], lambda doc: True)])
+            await index_archive_file(path.name, ids)
+
+async def claim_archive_batch(collection, query: dict, sort: Optional[str] = None) -> Optional[str]:
+    """The archive_batch id of a batch left over by an interrupted run, or of a new batch of documents matching query"""
+    leftover = await collection.find_one({"archive_batch": {"$exists": True}}, {"_id": 0, "archive_batch": 1})
+    if leftover:
+        return leftover["archive_batch"]
+    docs = collection.find(query, {"_id": 0, "id": 1})
+    if sort:
+        docs = docs.sort(sort, ASCENDING)
+    ids = [doc["id"] for doc in await docs.limit(ARCHIVE_BATCH_SIZE).to_list(None)]
+    if not ids:
+        return None
+    batch_id = uuid.uuid4().hex
+    await collection.update_many(
+        {"id": {"$in": ids}, "archive_batch": {"$exists": False}}, {"$set": {"archive_batch": batch_id}}
+    )
+    return batch_id
+
+async def archive_payments(before_fiscal_year: int, target: str) -> int:
+    """Move payments dated before before_fiscal_year out of the payments collection"""
+    cutoff = fiscal_year_start(before_fiscal_year, FISCAL_YEAR_START_MONTH)
+    archived = 0
+    while True:
+        batch_id = await claim_archive_batch(db.payments, {"payment_date": {"$lt": cutoff}}, "payment_date")
+        if batch_id is None:
+            return archived
+        batch = await db.payments.find({"archive_batch": batch_id}, {"_id": 0, "archive_batch": 0}).to_list(None)
+        if target == "ndjson":
+            by_year = {}
+            for payment in batch:
+                by_year.setdefault(fiscal_year_of(payment["payment_date"], FISCAL_YEAR_START_MONTH), []).append(payment)
+            for fiscal_year, payments in by_year.items():
+                path = archive_files.payments_path(fiscal_year, batch_id)
+                await asyncio.to_thread(write_ndjson_once, path, payments)
+                await index_archive_file(path.name, [payment["id"] for payment in payments])
+        else:
+            await copy_to_archive_collection(db.payments_archive, [dict(payment) for payment in batch])
+        # Summaries before the delete, so a crash in between leaves the batch to be resumed
+        await record_archive_summaries(batch_id, batch)
+        await db.payments.delete_many({"archive_batch": batch_id})
+        archived += len(batch)
+
+async def archive_members(target: str) -> int:
+    """Move soft-deleted members out of the members collection"""
+    archived = 0
+    while True:
+        batch_id = await claim_archive_batch(db.members, {"is_active": False})
+        if batch_id is None:
+            return archived
+        batch = await db.members.find(
+            {"archive_batch": batch_id}, {"_id": 0, "name_tokens": 0, "archive_batch": 0}
+        ).to_list(None)
+        if target == "ndjson":
+            await asyncio.to_thread(write_ndjson_once, archive_files.members_path(batch_id), batch)
+        else:
+            await copy_to_archive_collection(db.members_archive, batch)
+        await db.members.delete_many({"archive_batch": batch_id})
+        archived += len(batch)
+
+async def run_archival(before_fiscal_year: Optional[int] = None, target: Optional[str] = None) -> dict:
+    before_fiscal_year = before_fiscal_year or default_archive_fiscal_year()
+    target = target or ARCHIVE_TARGET
+    if target not in ("collection", "ndjson"):
+        raise ValueError(f"Unknown archive target '{target}'")
+    payments = await archive_payments(before_fiscal_year, target)
+    members = await archive_members(target)
+    logger.info(f"Archived {payments} payments before FY{before_fiscal_year} and {members} members to {target}")
+    return {"before_fiscal_year": before_fiscal_year, "target": target, "payments": payments, "members": members}
+
+def archive_file_predicate(query: dict):
+    """The in-memory equivalent of an audit query, for documents read back from NDJSON"""
+    date_range = query.get("payment_date", {})
+
+    def matches(doc: dict) -> bool:
+        if any(doc.get(field) != value for field, value in query.items() if field != "payment_date"):
+            return False
+        # orjson wrote the datetime as an ISO string
+        doc["payment_date"] = datetime.fromisoformat(doc["payment_date"])
+        if "$gte" in date_range and doc["payment_date"] < date_range["$gte"]:
+            return False
+        if "$lt" in date_range and doc["payment_date"] >= date_range["$lt"]:
+            return False
+        return True
+    return matches
+
+async def find_archived_payments(query: dict) -> List[dict]:
+    """Archived payments matching query from both the archive collection and NDJSON files"""
+    payments = await db.payments_archive.find(query, {"_id": 0}).to_list(None)
+    date_range = query.get("payment_date", {})
+    paths = archive_files.payment_files(
+        fiscal_year_of(date_range["$gte"], FISCAL_YEAR_START_MONTH) if "$gte" in date_range else None,
+        fiscal_year_of(date_range["$lt"], FISCAL_YEAR_START_MONTH) if "$lt" in date_range else None,
+    )
+    if paths:
+        payments += await asyncio.to_thread(lambda: list(scan_ndjson(paths, archive_file_predicate(query))))
+    return payments
+
+async def find_archived_payment(payment_id: str) -> Optional[dict]:
+    payment = await db.payments_archive.find_one({"id": payment_id}, {"_id": 0})
+    if payment is None:
+        indexed = await db.payment_archive_files.find_one({"id": payment_id}, {"_id": 0, "file": 1})
+        if indexed:
+            paths = [archive_files.payment_file(indexed["file"])]
+            payment = await asyncio.to_thread(
+                lambda: next(scan_ndjson(paths, archive_file_predicate({"id": payment_id})), None)
+            )
+    return payment
+
+async def find_archived_member(member_id: str) -> Optional[dict]:
+    member = await db.members_archive.find_one({"id": member_id}, {"_id": 0})
+    if member is None:
+        paths = archive_files.member_files()
+        member = await asyncio.to_thread(
+            lambda: next(scan_ndjson(paths, lambda doc: doc["id"] == member_id), None)
+        )
+    return member
+
+async def find_archived_members(member_ids: List[str], fields: dict) -> List[dict]:
+    """Archived members with the given ids, from both the archive collection and NDJSON files"""
+    members = await db.members_archive.find({"id": {"$in": member_ids}}, fields).to_list(None)
+    missing = set(member_ids) - {member["id"] for member in members}
+    paths = archive_files.member_files()
+    if missing and paths:
+        found = await asyncio.to_thread(lambda: list(scan_ndjson(paths, lambda doc: doc["id"] in missing)))
+        members += [{field: member.get(field) for field in fields if field != "_id"} for member in found]
+    return members
+
+# Receipts
+# PDFs are rendered in a process pool, so ReportLab never blocks the event loop, and kept
+# in RECEIPT_DIR under their receipt_number; a reprint is a file read. Receipts are issued
+# documents, so a cached PDF keeps the member name it was first printed with.
+RECEIPT_DIR = Path(os.environ.get('RECEIPT_DIR', ROOT_DIR / 'receipt_cache'))
+RECEIPT_WORKERS = int(os.environ.get('RECEIPT_WORKERS', 2))
+RECEIPT_ZIP_MAX = 1000
+
+receipt_pool: Optional[ProcessPoolExecutor] = None
+
+def receipt_path(receipt_number: str) -> Path:
+    return RECEIPT_DIR / f"{re.sub(r'[^A-Za-z0-9_-]', '_', receipt_number)}.pdf"
+
+async def render_receipts(payments: List[dict]) -> List[Path]:
+    """Paths to the receipts for payments, rendering the ones not cached yet"""
+    global receipt_pool
+    if receipt_pool is None:
+        RECEIPT_DIR.mkdir(parents=True, exist_ok=True)
+        # Spawned rather than forked: forking a process that runs Motor's threads is unsafe
+        receipt_pool = ProcessPoolExecutor(RECEIPT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+    loop = asyncio.get_running_loop()
+    paths = [receipt_path(payment["receipt_number"]) for payment in payments]
+    await asyncio.gather(*[
+        loop.run_in_executor(receipt_pool, render_receipt_file, payment, str(path))
+        for payment, path in zip(payments, paths) if not path.exists()
+    ])
+    return paths
+
+def write_receipts_zip(paths: List[Path]) -> str:
+    # PDFs are already compressed, so entries are stored as is
+    fd, path = tempfile.mkstemp(suffix=".zip")
+    try:
+        with os.fdopen(fd, "wb") as file, zipfile.ZipFile(file, "w", zipfile.ZIP_STORED) as archive:
+            for receipt in paths:
+                archive.write(receipt, receipt.name)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+# Prayer Times Service
+# Using Aladhan API for prayer times in Bangalore
+ALADHAN_URL = "http://api.aladhan.com/v1"
+PRAYER_LAT, PRAYER_LON = 12.9715987, 77.5945627  # Ripponpet, Bangalore coordinates
+PRAYER_METHOD = 4  # Umm al-Qura
+PRAYER_TZ_OFFSET = 5.5  # IST
+PRAYER_CACHE_TTL = 6 * 3600
+PRAYER_RANGE_MAX_DAYS = 366
+PRAYER_PREFETCH_DAYS = 30
+PRAYER_PREFETCH_INTERVAL = 12 * 3600
+
+# Outbound HTTP client, created at startup (see connect_http_client)
+HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', 10))
+HTTP_MAX_CONNECTIONS = int(os.environ.get('HTTP_MAX_CONNECTIONS', 10))
+http_client = None
+
+prayer_cache = TTLCache(PRAYER_CACHE_TTL)
+prayer_locks = {}
+
+def parse_aladhan_day(day_data: dict) -> PrayerTimes:
+    timings = day_data['timings']
+    hijri_date = day_data['date']['hijri']
+    gregorian = datetime.strptime(day_data['date']['gregorian']['date'], '%d-%m-%Y')
+
+    # Calendar timings carry a timezone suffix, e.g. "05:01 (IST)"
+    return PrayerTimes(
+        date=gregorian.strftime('%Y-%m-%d'),
+        hijri_date=f"{hijri_date['date']} {hijri_date['month']['en']} {hijri_date['year']}",
+        fajr=timings['Fajr'].split()[0],
+        dhuhr=timings['Dhuhr'].split()[0],
+        asr=timings['Asr'].split()[0],
+        maghrib=timings['Maghrib'].split()[0],
+        isha=timings['Isha'].split()[0]
+    )
+
+def calculate_prayer_times(start: date, end: date) -> List[PrayerTimes]:
+    """Prayer times from the local astronomical engine; no network involved"""
+    # Imported on first use so NumPy stays off the startup path
+    from prayer_calc import compute_prayer_times
+
+    return [
+        PrayerTimes(**day)
+        for day in compute_prayer_times(start, end, PRAYER_LAT, PRAYER_LON, PRAYER_TZ_OFFSET)
+    ]
+
+async def get_prayer_calendar_from_api(year: int, month: int) -> List[PrayerTimes]:
+    try:
+        with metrics.PRAYER_API_LATENCY.time():
+            response = await http_client.get(f"{ALADHAN_URL}/calendar/{year}/{month}", params={
+                "latitude": PRAYER_LAT, "longitude": PRAYER_LON, "method": PRAYER_METHOD
+            })
+        response.raise_for_status()
+    except Exception:
+        metrics.PRAYER_API_ERRORS.inc()
+        raise
+    return [parse_aladhan_day(day_data) for day_data in response.json()['data']]
+
+async def store_prayer_times(days: List[PrayerTimes]):
+    if not days:
+        return
+    await db.prayer_times.bulk_write([
+        ReplaceOne({"date": times.date}, times.dict(), upsert=True) for times in days
+    ], ordered=False)
+    for times in days:
+        prayer_cache.set(times.date, times)
+    await versions.bump(VERSION_PRAYER_TIMES)
+
+async def fill_prayer_times(days: List[PrayerTimes]):
+    """Store calculated days without overwriting times already fetched from upstream"""
+    if not days:
+        return
+    await db.prayer_times.bulk_write([
+        UpdateOne({"date": times.date}, {"$setOnInsert": times.dict()}, upsert=True) for times in days
+    ], ordered=False)
+
+async def load_prayer_times(day: str) -> PrayerTimes:
+    """Memory cache, then Mongo, then the local engine; one Mongo write per date at a time"""
+    cached = prayer_cache.get(day)
+    if cached:
+        return cached
+
+    lock = prayer_locks.setdefault(day, asyncio.Lock())
+    async with lock:
+        cached = prayer_cache.get(day)
+        if cached:
+            return cached
+
+        stored = await db.prayer_times.find_one({"date": day}, {"_id": 0})
+        if stored:
+            prayer_times = PrayerTimes(**stored)
+            prayer_cache.set(day, prayer_times)
+        else:
+            # Upstream values replace these on the next prefetch
+            day_date = date.fromisoformat(day)
+            prayer_times = calculate_prayer_times(day_date, day_date)[0]
+            await fill_prayer_times([prayer_times])
+            prayer_cache.set(day, prayer_times)
+    prayer_locks.pop(day, None)
+    return prayer_times
+
+async def prefetch_prayer_times():
+    """Fill the cache for the next PRAYER_PREFETCH_DAYS days from the calendar endpoint"""
+    today = date.today()
+    wanted = {(today + timedelta(days=n)).isoformat() for n in range(PRAYER_PREFETCH_DAYS)}
+    months = sorted({(day[:4], day[5:7]) for day in wanted})
+
+    days = []
+    for year, month in months:
+        calendar = await get_prayer_calendar_from_api(int(year), int(month))
+        days += [times for times in calendar if times.date in wanted]
+    await store_prayer_times(days)
+    logger.info(f"Prefetched prayer times for {len(days)} days")
+
+async def prefetch_prayer_times_forever():
+    while True:
+        try:
+            await prefetch_prayer_times()
+        except Exception as e:
+            logger.error(f"Error prefetching prayer times: {e}")
+            # Make sure the coming days are at least covered by the local engine
+            today = date.today()
+            try:
+                await fill_prayer_times(calculate_prayer_times(today, today + timedelta(days=PRAYER_PREFETCH_DAYS - 1)))
+            except Exception as e:
+                # Most likely MongoDB is down too; try again next interval rather than end the loop
+                logger.error(f"Error filling prayer times from the local engine: {e}")
+        await asyncio.sleep(PRAYER_PREFETCH_INTERVAL)
+
+# Live Events
+# Screens subscribe to /api/events. On a replica set a change stream feeds every worker
+# with every write. Otherwise the write handlers publish, through Redis pub/sub to every
+# worker when REDIS_URL is set, and only to their own worker's subscribers without it.
+EVENT_DEBOUNCE_SECONDS = 1
+CHANGE_STREAM_RETRY_SECONDS = 5
+
+event_broker = EventBroker()
+
+def deliver_event(event: str, data):
+    """Hand an event relayed from any worker to this worker's directory or subscribers"""
+    if event == MEMBER_DIRECTORY_EVENT:
+        member_directory.put(data)
+    else:
+        event_broker.publish(event, data)
+
+event_relay = (
+    RedisEventRelay(os.environ['REDIS_URL'], f"masjid:{os.environ['DB_NAME']}:events", deliver_event)
+    if os.environ.get('REDIS_URL') else None
+)
+change_stream_active = False
+dashboard_event_pending = False
+
+async def broadcast(event: str, data):
+    """Publish to the subscribers of every worker, through the relay when there is one"""
+    if event_relay:
+        try:
+            await event_relay.publish(event, data)
+            return
+        except Exception as e:
+            logger.error(f"Event relay publish failed: {e}")
+    event_broker.publish(event, data)
+
+async def publish_write(event: str, data: dict):
+    """Publish from a write handler, unless the change stream is going to deliver it"""
+    if not change_stream_active:
+        # insert_one/insert_many add the ObjectId to the document they were given
+        await broadcast(event, {key: value for key, value in data.items() if key != "_id"})
+
+async def publish_dashboard_event():
+    global dashboard_event_pending
+    await asyncio.sleep(EVENT_DEBOUNCE_SECONDS)
+    dashboard_event_pending = False
+    stats = await load_dashboard_stats()
+    if change_stream_active:
+        # Every worker saw the change and publishes to its own subscribers
+        event_broker.publish("dashboard", stats)
+    else:
+        await broadcast("dashboard", stats)
+
+async def dashboard_changed():
+    """Invalidate the cached dashboard and push fresh totals, once per burst of writes"""
+    global dashboard_event_pending
+    await response_cache.invalidate(CACHE_DASHBOARD_STATS)
+    # Without a change stream other workers' subscribers only hear of this write through the relay
+    has_listeners = event_broker.subscribers or (event_relay and not change_stream_active)
+    if has_listeners and not dashboard_event_pending:
+        dashboard_event_pending = True
+        task = asyncio.create_task(publish_dashboard_event())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+async def watch_changes_forever():
+    global change_stream_active
+    # Payment updates (such as rename fan-outs) are left out: each would cost a document lookup
+    pipeline = [{"$match": {"$or": [
+        {"operationType": "insert", "ns.coll": {"$in": ["payments", "announcements"]}},
+        {"operationType": {"$in": ["insert", "update", "replace"]}, "ns.coll": "members"},
+    ]}}]
+    resume_token = None
+    while True:
+        try:
+            async with db.watch(pipeline, resume_after=resume_token, full_document="updateLookup") as stream:
+                change_stream_active = True
+                logger.info("Publishing live events from the MongoDB change stream")
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    collection = change["ns"]["coll"]
+                    if collection == "members":
+                        if change.get("fullDocument"):
+                            member_directory.put(change["fullDocument"])
+                        await dashboard_changed()
+                    elif change["operationType"] == "insert":
+                        document = change["fullDocument"]
+                        document.pop("_id", None)
+                        document.pop("name_tokens", None)
+                        if collection == "payments":
+                            event_broker.publish("payment", document)
+                            await dashboard_changed()
+                        else:
+                            event_broker.publish("announcement", document)
+        except OperationFailure as e:
+            if e.code == 40573:  # change streams need a replica set
+                if event_relay:
+                    logger.info("Change streams unavailable; relaying live events from write handlers through Redis")
+                else:
+                    logger.warning(
+                        "Change streams unavailable and REDIS_URL unset: live events reach only screens "
+                        "connected to the worker that handled the write, so run a single worker"
+                    )
+                change_stream_active = False
+                return
+            logger.error(f"Change stream error: {e}")
+        except Exception as e:
+            logger.error(f"Change stream error: {e}")
+        change_stream_active = False
+        await asyncio.sleep(CHANGE_STREAM_RETRY_SECONDS)
+
+async def publish_prayer_times_forever():
+    """Push the new day's prayer times just after midnight"""
+    while True:
+        now = datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        await asyncio.sleep((midnight - now).total_seconds() + 1)
+        try:
+            prayer_times = await load_prayer_times(datetime.now().strftime('%Y-%m-%d'))
+            event_broker.publish("prayer_times", prayer_times.dict())
+        except Exception as e:
+            logger.error(f"Error publishing prayer times: {e}")
+
 # API Routes
 @api_router.get("/")
 async def root():
     return {"message": "MAKKA MASJID RIPPONPET - Management System API"}
 
+@api_router.get("/health")
+async def health():
+    """Readiness probe: this worker has started up and can reach MongoDB"""
+    try:
+        await asyncio.wait_for(db.command("ping"), HEALTH_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Health check failed: {e}")
+        raise HTTPException(status_code=503, detail="MongoDB unavailable")
+    return {"status": "ok", "pid": os.getpid()}
+
 # Member Management Routes
 @api_router.post("/members", response_model=Member)
-async def create_member(member_data: MemberCreate):
+async def create_member(member_data: MemberCreate, response: Response,
+                        idempotency_key: Optional[str] = IDEMPOTENCY_KEY_HEADER):
+    return await idempotent("members", idempotency_key, member_data, response,
+                            lambda record: insert_member(member_data, record))
+
+async def insert_member(member_data: MemberCreate, record: RecordResult) -> Member:
     member = Member(**member_data.dict())
-    await db.members.insert_one(member.dict())
+    await db.members.insert_one(member_doc(member))
+    await record(member)
+    member_directory.put(member.dict())
+    await versions.bump(VERSION_MEMBERS)
+    await dashboard_changed()
     return member
 
+@api_router.post("/members/bulk")
+async def bulk_create_members(file: UploadFile = File(...)):
+    report = {"inserted": 0, "duplicates": [], "errors": []}
+    seen = set()
+    batch = []
+
+    async def flush():
+        # One index-backed lookup per batch instead of one query per row
+        existing = await db.members.find(
+            {
+                "phone": {"$in": [member.phone for _, member in batch]},
+                "id_proof_number": {"$in": [member.id_proof_number for _, member in batch]},
+                "is_active": True,
+            },
+            {"_id": 0, "phone": 1, "id_proof_number": 1}
+        ).to_list(None)
+        existing = {(member["phone"], member["id_proof_number"]) for member in existing}
+
+        rows = []
+        for row_number, member in batch:
+            if (member.phone, member.id_proof_number) in existing:
+                report["duplicates"].append({"row": row_number, "phone": member.phone, "id_proof_number": member.id_proof_number})
+            else:
+                rows.append((row_number, member))
+        batch.clear()
+        if not rows:
+            return
+
+        try:
+            result = await db.members.insert_many([member_doc(member) for _, member in rows], ordered=False)
+            report["inserted"] += len(result.inserted_ids)
+            failed = set()
+        except BulkWriteError as e:
+            report["inserted"] += e.details["nInserted"]
+            failed = {error["index"] for error in e.details["writeErrors"]}
+            for error in e.details["writeErrors"]:
+                report["errors"].append({"row": rows[error["index"]][0], "errors": [{"field": None, "message": error["errmsg"]}]})
+        for index, (_, member) in enumerate(rows):
+            if index not in failed:
+                member_directory.put(member.dict())
+
+    def unreadable(row_number: int, message: str):
+        report["errors"].append({"row": row_number, "errors": [{"field": None, "message": message}]})
+
+    for row_number, row in iter_upload_rows(file, unreadable):
+        try:
+            member = Member(**parse_row(MemberCreate, row).dict())
+        except (ValidationError, ValueError) as e:
+            report["errors"].append({"row": row_number, "errors": validation_errors(e)})
+            continue
+
+        key = (member.phone, member.id_proof_number)
+        if key in seen:
+            report["duplicates"].append({"row": row_number, "phone": member.phone, "id_proof_number": member.id_proof_number})
+            continue
+        seen.add(key)
+
+        batch.append((row_number, member))
+        if len(batch) >= BULK_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    if report["inserted"]:
+        await versions.bump(VERSION_MEMBERS)
+    await dashboard_changed()
+    return report
+
 @api_router.get("/members", response_model=List[Member])
-async def get_members():
-    members = await db.members.find({"is_active": True}).to_list(1000)
-    return [Member(**member) for member in members]
+async def get_members(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_MAX, ge=1, le=PAGE_SIZE_MAX),
+    format: Literal["json", "ndjson"] = "json",
+    ids: Optional[str] = Query(None, description="Comma-separated member ids to fetch in one query"),
+):
+    not_modified, headers = await check_version(request, VERSION_MEMBERS)
+    if not_modified:
+        return not_modified
+    query = {"is_active": True}
+    if ids is not None:
+        response = await get_members_by_id(ids)
+    elif format == "ndjson":
+        response = stream_ndjson(db.members, query, "created_at", cursor, False, MEMBER_PROJECTION)
+    else:
+        response = await fetch_page(db.members, query, "created_at", cursor, limit, False, MEMBER_PROJECTION)
+    response.headers.update(headers)
+    return response
+
+async def get_members_by_id(ids: str) -> ORJSONResponse:
+    """Active members with the given ids, in the order requested; unknown ids are skipped"""
+    member_ids = list(dict.fromkeys(member_id for member_id in ids.split(",") if member_id))
+    if len(member_ids) > PAGE_SIZE_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {PAGE_SIZE_MAX} ids per request")
+    members = await db.members.find({"id": {"$in": member_ids}, "is_active": True}, MEMBER_PROJECTION).to_list(None)
+    by_id = {member["id"]: member for member in members}
+    return ORJSONResponse([by_id[member_id] for member_id in member_ids if member_id in by_id])
+
+@api_router.get("/members/search", response_model=List[Member])
+async def search_members(q: str = Query(..., min_length=1), limit: int = Query(20, ge=1, le=SEARCH_LIMIT_MAX)):
+    q = q.strip()
+    query_tokens = name_tokens(q)
+    if not query_tokens:
+        return ORJSONResponse([])
+    fields = {**MEMBER_PROJECTION, "name_tokens": 1}
+    prefix = account_prefix(q)
+
+    lookups = [
+        # Name prefix on every query word; the first word's prefix narrows the index scan
+        db.members.find({
+            "is_active": True,
+            "name_tokens": {"$all": [re.compile(f"^{re.escape(token)}") for token in query_tokens]},
+        }, fields).limit(SEARCH_LIMIT_MAX).to_list(SEARCH_LIMIT_MAX),
+    ]
+    if prefix:
+        lookups.append(db.members.find({
+            "is_active": True,
+            "account_number": {"$regex": f"^{re.escape(prefix)}"},
+        }, fields).limit(limit).to_list(limit))
+    if q.lstrip("+").isdigit():
+        lookups.append(db.members.find({"is_active": True, "phone": q}, fields).limit(limit).to_list(limit))
+
+    ranked = {}
+
+    def rank(results):
+        for member in results:
+            if member.get("phone") == q or member.get("account_number") == q.upper():
+                score = 10
+            else:
+                score = name_score(member.get("name_tokens", []), query_tokens)
+                if score is None:
+                    if not prefix or not member.get("account_number", "").startswith(prefix):
+                        continue
+                    # Below any name match
+                    score = 0
+            if score > ranked.get(member["id"], (float("-inf"), None))[0]:
+                ranked[member["id"]] = (score, member)
+
+    for results in await asyncio.gather(*lookups):
+        rank(results)
+    if len(ranked) < limit and len(query_tokens[0]) >= 3:
+        # Fuzzy candidates share the first two letters of every query word, which keeps
+        # common first names like Mohammed from flooding the candidate list
+        rank(await db.members.find({
+            "is_active": True,
+            "id": {"$nin": list(ranked)},
+            "name_tokens": {"$all": [re.compile(f"^{re.escape(token[:2])}") for token in query_tokens]},
+        }, FUZZY_CANDIDATE_FIELDS).limit(FUZZY_CANDIDATES_MAX).to_list(FUZZY_CANDIDATES_MAX))
+
+    results = [member for _, member in sorted(ranked.values(), key=lambda item: (-item[0], item[1]["name"]))[:limit]]
+    # Fuzzy candidates were fetched without the other member fields
+    partial = [member["id"] for member in results if "phone" not in member]
+    if partial:
+        full = await db.members.find({"id": {"$in": partial}}, MEMBER_PROJECTION).to_list(None)
+        full = {member["id"]: member for member in full}
+        results = [member if "phone" in member else full[member["id"]]
+                   for member in results if "phone" in member or member["id"] in full]
+    for member in results:
+        member.pop("name_tokens", None)
+    return ORJSONResponse(results)
 
 @api_router.get("/members/{member_id}", response_model=Member)
 async def get_member(member_id: str):
-    member = await db.members.find_one({"id": member_id, "is_active": True})
+    member = await db.members.find_one({"id": member_id, "is_active": True}, MEMBER_PROJECTION)
     if not member:
         raise HTTPException(status_code=404, detail="Member not found")
-    return Member(**member)
+    return ORJSONResponse(member)
+
+@api_router.get("/members/{member_id}/dues")
+async def get_member_dues(member_id: str, months: int = Query(12, ge=1, le=120)):
+    member = await db.members.find_one(
+        {"id": member_id, "is_active": True}, {"_id": 0, "id": 1, "name": 1, "account_number": 1, "created_at": 1}
+    )
+    if not member:
+        raise HTTPException(status_code=404, detail="Member not found")
+
+    period = recent_months(months)
+    coverage = await db.chanda_coverage.find(
+        {"member_id": member_id, "year": {"$in": sorted({year for year, _ in period})}}, {"_id": 0}
+    ).to_list(None)
+    coverage = {row["year"]: row["months"] for row in coverage}
+
+    joined = member["created_at"].year * 12 + member["created_at"].month - 1
+    paid, missing = [], []
+    for year, month in period:
+        if year * 12 + month < joined:
+            continue
+        (paid if coverage.get(year, 0) >> month & 1 else missing).append(month_label(year, month))
+
+    return {**member, "paid_months": paid, "missing_months": missing}
 
 @api_router.put("/members/{member_id}", response_model=Member)
 async def update_member(member_id: str, member_data: MemberCreate):
@@ -188,21 +1800,36 @@ async def update_member(member_id: str, member_data: MemberCreate):
     updated_data["created_at"] = existing_member["created_at"]
     
     member = Member(**updated_data)
-    await db.members.replace_one({"id": member_id}, member.dict())
+    await db.members.replace_one({"id": member_id}, member_doc(member))
+    await member_changed(member.dict())
+    if member.name != existing_member["name"]:
+        member_renames.put_nowait((member_id, True))
+    await versions.bump(VERSION_MEMBERS)
+    await dashboard_changed()
     return member
 
 @api_router.delete("/members/{member_id}")
 async def delete_member(member_id: str):
-    result = await db.members.update_one({"id": member_id}, {"$set": {"is_active": False}})
-    if result.matched_count == 0:
+    member = await db.members.find_one_and_update(
+        {"id": member_id}, {"$set": {"is_active": False}}, MEMBER_DIRECTORY_FIELDS
+    )
+    if member is None:
         raise HTTPException(status_code=404, detail="Member not found")
+    await member_changed({**member, "is_active": False})
+    await versions.bump(VERSION_MEMBERS)
+    await dashboard_changed()
     return {"message": "Member deleted successfully"}
 
 # Payment Routes
 @api_router.post("/payments", response_model=Payment)
-async def create_payment(payment_data: PaymentCreate):
+async def create_payment(payment_data: PaymentCreate, response: Response,
+                         idempotency_key: Optional[str] = IDEMPOTENCY_KEY_HEADER):
+    return await idempotent("payments", idempotency_key, payment_data, response,
+                            lambda record: insert_payment(payment_data, record))
+
+async def insert_payment(payment_data: PaymentCreate, record: RecordResult) -> Payment:
     # Get member details
-    member = await db.members.find_one({"id": payment_data.member_id, "is_active": True})
+    member = await member_directory.get(payment_data.member_id)
     if not member:
         raise HTTPException(status_code=404, detail="Member not found")
     
@@ -212,40 +1839,231 @@ async def create_payment(payment_data: PaymentCreate):
         member_account_number=member["account_number"]
     )
     
-    await db.payments.insert_one(payment.dict())
+    payment_doc = payment.dict()
+    try:
+        await db.payments.insert_one(payment_doc)
+    except DuplicateKeyError as e:
+        if "transaction_id" not in str(e):
+            raise
+        raise HTTPException(status_code=409, detail=f"Transaction ID {payment.transaction_id} is already recorded")
+    await record(payment)
+    await record_payment_aggregates([payment_doc])
+    await publish_write("payment", payment_doc)
+    await dashboard_changed()
     return payment
 
+@api_router.post("/payments/bulk")
+async def bulk_create_payments(
+    file: UploadFile = File(...),
+    payment_type: PaymentType = "donation",
+    payment_method: str = "UPI",
+    month_year: Optional[str] = None,
+):
+    report = {"matched": [], "unmatched": [], "duplicates": [], "errors": []}
+    seen = set()
+    batch = []
+
+    async def flush():
+        ids = {row["member_id"] for _, row in batch if "member_id" in row}
+        accounts = {row["account_number"] for _, row in batch if "account_number" in row}
+        phones = {row["phone"] for _, row in batch if "phone" in row}
+        transactions = [row["transaction_id"] for _, row in batch if "transaction_id" in row]
+
+        # One $in query for members and one for already recorded transactions per batch
+        members, recorded = await asyncio.gather(
+            db.members.find(
+                {"is_active": True, "$or": [
+                    {"id": {"$in": list(ids)}},
+                    {"account_number": {"$in": list(accounts)}},
+                    {"phone": {"$in": list(phones)}},
+                ]},
+                {"_id": 0, "id": 1, "name": 1, "account_number": 1, "phone": 1}
+            ).to_list(None),
+            db.payments.find({"transaction_id": {"$in": transactions}}, {"_id": 0, "transaction_id": 1}).to_list(None),
+        )
+        by_id = {member["id"]: member for member in members}
+        by_account = {member["account_number"]: member for member in members}
+        by_phone = {}
+        for member in members:
+            by_phone.setdefault(member["phone"], []).append(member)
+        recorded = {payment["transaction_id"] for payment in recorded}
+
+        payments = []
+        for row_number, row in batch:
+            transaction_id = row.get("transaction_id")
+            if transaction_id in recorded:
+                report["duplicates"].append({"row": row_number, "transaction_id": transaction_id})
+                continue
+
+            member = by_id.get(row.get("member_id")) or by_account.get(row.get("account_number"))
+            if not member and len(by_phone.get(row.get("phone"), [])) == 1:
+                member = by_phone[row["phone"]][0]
+            if not member:
+                report["unmatched"].append({
+                    "row": row_number,
+                    "transaction_id": transaction_id,
+                    "amount": row["amount"],
+                    "reason": "Ambiguous phone" if row.get("phone") in by_phone else "Member not found",
+                })
+                continue
+
+            payment = Payment(
+                member_id=member["id"],
+                member_name=member["name"],
+                member_account_number=member["account_number"],
+                amount=row["amount"],
+                payment_type=row.get("payment_type", payment_type),
+                payment_method=payment_method,
+                transaction_id=transaction_id,
+                month_year=row.get("month_year", month_year),
+                **({"payment_date": row["payment_date"]} if "payment_date" in row else {})
+            )
+            payments.append((row_number, payment.dict()))
+        batch.clear()
+        if not payments:
+            return
+
+        failed = set()
+        try:
+            await db.payments.insert_many([payment for _, payment in payments], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details["writeErrors"]:
+                failed.add(error["index"])
+                row_number, payment = payments[error["index"]]
+                if error["code"] == 11000 and "transaction_id" in error["errmsg"]:
+                    report["duplicates"].append({"row": row_number, "transaction_id": payment["transaction_id"]})
+                else:
+                    report["errors"].append({"row": row_number, "message": error["errmsg"]})
+
+        inserted = [payment for index, (_, payment) in enumerate(payments) if index not in failed]
+        await record_payment_aggregates(inserted)
+        for payment in inserted:
+            await publish_write("payment", payment)
+        report["matched"] += [
+            {
+                "row": row_number,
+                "transaction_id": payment["transaction_id"],
+                "payment_id": payment["id"],
+                "member_id": payment["member_id"],
+                "receipt_number": payment["receipt_number"],
+                "amount": payment["amount"],
+            }
+            for index, (row_number, payment) in enumerate(payments) if index not in failed
+        ]
+
+    def unreadable(row_number: int, message: str):
+        report["errors"].append({"row": row_number, "message": message})
+
+    for row_number, row in iter_upload_rows(file, unreadable):
+        try:
+            row = normalize_statement_row(parse_statement_line(row) if isinstance(row, str) else row)
+            if "amount" not in row:
+                raise ValueError("Missing amount")
+            row["amount"] = parse_statement_amount(row["amount"])
+            if "payment_date" in row:
+                row["payment_date"] = parse_statement_date(row["payment_date"])
+            if row.get("payment_type", payment_type) not in PAYMENT_TYPES:
+                raise ValueError(f"Unknown payment type '{row['payment_type']}'")
+        except ValueError as e:
+            report["errors"].append({"row": row_number, "message": str(e)})
+            continue
+
+        transaction_id = row.get("transaction_id")
+        if transaction_id in seen:
+            report["duplicates"].append({"row": row_number, "transaction_id": transaction_id})
+            continue
+        if transaction_id:
+            seen.add(transaction_id)
+
+        batch.append((row_number, row))
+        if len(batch) >= BULK_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    await dashboard_changed()
+    return report
+
 @api_router.get("/payments", response_model=List[Payment])
-async def get_payments():
-    payments = await db.payments.find().sort("payment_date", -1).to_list(1000)
-    return [Payment(**payment) for payment in payments]
+async def get_payments(
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_MAX, ge=1, le=PAGE_SIZE_MAX),
+    format: Literal["json", "ndjson"] = "json",
+):
+    if format == "ndjson":
+        return stream_ndjson(db.payments, {}, "payment_date", cursor, True, PAYMENT_PROJECTION)
+    return await fetch_page(db.payments, {}, "payment_date", cursor, limit, True, PAYMENT_PROJECTION)
 
 @api_router.get("/payments/member/{member_id}", response_model=List[Payment])
 async def get_member_payments(member_id: str):
-    payments = await db.payments.find({"member_id": member_id}).sort("payment_date", -1).to_list(1000)
-    return [Payment(**payment) for payment in payments]
+    payments = await db.payments.find({"member_id": member_id}, PAYMENT_PROJECTION).sort("payment_date", -1).to_list(1000)
+    return ORJSONResponse(payments)
+
+@api_router.get("/payments/receipts.zip")
+async def get_receipts_zip(
+    member_id: Optional[str] = None,
+    month_year: Optional[str] = None,
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+):
+    if not (member_id or month_year or from_date or to_date):
+        raise HTTPException(status_code=400, detail="Filter by member_id, month_year or a from/to date range")
+    # Hot payments only: archived receipts are fetched one at a time from get_receipt
+    query = export_query("payment_date", from_date, to_date, member_id=member_id, month_year=month_year)
+    payments = await db.payments.find(query, PAYMENT_PROJECTION).sort("payment_date", ASCENDING) \
+        .limit(RECEIPT_ZIP_MAX + 1).to_list(None)
+    if not payments:
+        raise HTTPException(status_code=404, detail="No payments found")
+    if len(payments) > RECEIPT_ZIP_MAX:
+        raise HTTPException(status_code=400, detail=f"More than {RECEIPT_ZIP_MAX} receipts; narrow the filter")
+
+    path = await asyncio.to_thread(write_receipts_zip, await render_receipts(payments))
+    return FileResponse(
+        path, filename="receipts.zip", media_type="application/zip", background=BackgroundTask(os.remove, path)
+    )
+
+@api_router.get("/payments/{payment_id}/receipt.pdf")
+async def get_receipt(payment_id: str):
+    payment = await db.payments.find_one({"id": payment_id}, PAYMENT_PROJECTION)
+    if not payment:
+        payment = await find_archived_payment(payment_id)
+        if not payment:
+            raise HTTPException(status_code=404, detail="Payment not found")
+    [path] = await render_receipts([payment])
+    return FileResponse(
+        path, filename=f"{payment['receipt_number']}.pdf", media_type="application/pdf",
+        content_disposition_type="inline"
+    )
 
 # Prayer Times Route
 @api_router.get("/prayer-times", response_model=PrayerTimes)
-async def get_prayer_times():
-    # Check if we have today's prayer times cached
+async def get_prayer_times(request: Request, response: Response):
     today = datetime.now().strftime('%Y-%m-%d')
-    cached_times = await db.prayer_times.find_one({"date": today})
-    
-    if cached_times:
-        return PrayerTimes(**cached_times)
-    
-    # Fetch new prayer times
-    prayer_times = await get_prayer_times_from_api()
-    
-    # Cache the prayer times
-    await db.prayer_times.replace_one(
-        {"date": today}, 
-        prayer_times.dict(), 
-        upsert=True
-    )
-    
-    return prayer_times
+    not_modified, headers = await check_version(request, VERSION_PRAYER_TIMES, f"-{today}")
+    if not_modified:
+        return not_modified
+    response.headers.update(headers)
+    return await load_prayer_times(today)
+
+@api_router.get("/prayer-times/range", response_model=List[PrayerTimes])
+async def get_prayer_times_range(
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+):
+    if to_date < from_date:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (to_date - from_date).days >= PRAYER_RANGE_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {PRAYER_RANGE_MAX_DAYS} days")
+
+    stored = await db.prayer_times.find(
+        {"date": {"$gte": from_date.isoformat(), "$lte": to_date.isoformat()}}, {"_id": 0}
+    ).to_list(None)
+    stored = {times["date"]: PrayerTimes(**times) for times in stored}
+
+    calculated = [times for times in calculate_prayer_times(from_date, to_date) if times.date not in stored]
+    await fill_prayer_times(calculated)
+
+    return sorted([*stored.values(), *calculated], key=lambda times: times.date)
 
 # Imam Management Routes
 @api_router.post("/imam", response_model=Imam)
@@ -257,14 +2075,21 @@ async def create_imam(imam_data: ImamCreate):
     
     imam = Imam(**imam_data.dict())
     await db.imams.insert_one(imam.dict())
+    await response_cache.invalidate(CACHE_ACTIVE_IMAM)
+    await versions.bump(VERSION_ACTIVE_IMAM)
     return imam
 
 @api_router.get("/imam", response_model=Optional[Imam])
-async def get_active_imam():
-    imam = await db.imams.find_one({"is_active": True})
-    if not imam:
-        return None
-    return Imam(**imam)
+async def get_active_imam(request: Request):
+    not_modified, headers = await check_version(request, VERSION_ACTIVE_IMAM)
+    if not_modified:
+        return not_modified
+    response = await response_cache.respond(CACHE_ACTIVE_IMAM, load_active_imam)
+    response.headers.update(headers)
+    return response
+
+async def load_active_imam():
+    return await db.imams.find_one({"is_active": True}, IMAM_PROJECTION)
 
 @api_router.put("/imam/{imam_id}", response_model=Imam)
 async def update_imam(imam_id: str, imam_data: ImamCreate):
@@ -278,45 +2103,398 @@ async def update_imam(imam_id: str, imam_data: ImamCreate):
     
     imam = Imam(**updated_data)
     await db.imams.replace_one({"id": imam_id}, imam.dict())
+    await response_cache.invalidate(CACHE_ACTIVE_IMAM)
+    await versions.bump(VERSION_ACTIVE_IMAM)
     return imam
 
 # Announcements Routes
 @api_router.post("/announcements", response_model=Announcement)
 async def create_announcement(announcement_data: AnnouncementCreate):
     announcement = Announcement(**announcement_data.dict())
-    await db.announcements.insert_one(announcement.dict())
+    announcement_doc = announcement.dict()
+    await db.announcements.insert_one(announcement_doc)
+    await response_cache.invalidate(CACHE_ANNOUNCEMENTS)
+    await versions.bump(VERSION_ANNOUNCEMENTS)
+    await publish_write("announcement", announcement_doc)
     return announcement
 
 @api_router.get("/announcements", response_model=List[Announcement])
-async def get_announcements():
-    announcements = await db.announcements.find({"is_active": True}).sort("created_at", -1).to_list(100)
-    return [Announcement(**announcement) for announcement in announcements]
+async def get_announcements(request: Request):
+    not_modified, headers = await check_version(request, VERSION_ANNOUNCEMENTS)
+    if not_modified:
+        return not_modified
+    response = await response_cache.respond(CACHE_ANNOUNCEMENTS, load_announcements)
+    response.headers.update(headers)
+    return response
+
+async def load_announcements():
+    return await db.announcements.find({"is_active": True}, ANNOUNCEMENT_PROJECTION).sort("created_at", -1).to_list(100)
 
 # Dashboard Statistics Route
 @api_router.get("/dashboard/stats")
 async def get_dashboard_stats():
-    total_members = await db.members.count_documents({"is_active": True})
-    committee_members = await db.members.count_documents({"is_active": True, "is_committee_member": True})
-    
-    # This month's collections
+    return await response_cache.respond(CACHE_DASHBOARD_STATS, load_dashboard_stats)
+
+async def load_dashboard_stats():
     current_month = datetime.now().strftime('%Y-%m')
-    monthly_collections = await db.payments.aggregate([
-        {"$match": {"month_year": current_month}},
-        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-    ]).to_list(1)
-    
-    total_monthly = monthly_collections[0]["total"] if monthly_collections else 0
-    
-    # Recent payments
-    recent_payments = await db.payments.find().sort("payment_date", -1).limit(5).to_list(5)
-    
+    total_members, committee_members, rollups, recent_payments = await asyncio.gather(
+        db.members.count_documents({"is_active": True}),
+        db.members.count_documents({"is_active": True, "is_committee_member": True}),
+        # This month's collections
+        db.payment_rollups.find({"month": current_month}, {"_id": 0}).to_list(None),
+        # Recent payments
+        db.payments.find({}, PAYMENT_PROJECTION).sort("payment_date", -1).limit(5).to_list(5),
+    )
+
     return {
         "total_members": total_members,
         "committee_members": committee_members,
-        "monthly_collections": total_monthly,
-        "recent_payments": [Payment(**payment) for payment in recent_payments]
+        "monthly_collections": sum(rollup["total"] for rollup in rollups),
+        "monthly_collections_by_type": {rollup["payment_type"]: rollup["total"] for rollup in rollups},
+        "recent_payments": recent_payments
+    }
+
+# Bootstrap Route
+# Everything the frontend needs on first load in one round trip. The cached parts are
+# spliced in as the already-encoded JSON bodies the individual routes would serve.
+# Members are left out unless members_limit asks for the first page of them: the member
+# list can run to thousands of rows that the first screen doesn't show.
+BOOTSTRAP_GZIP_MIN_SIZE = 1024
+
+async def no_members_page():
+    return [], None
+
+@api_router.get("/bootstrap")
+async def get_bootstrap(request: Request, members_limit: int = Query(0, ge=0, le=PAGE_SIZE_MAX)):
+    today = datetime.now().strftime('%Y-%m-%d')
+    dashboard, announcements, imam, prayer_times, (members, members_cursor) = await asyncio.gather(
+        response_cache.body(CACHE_DASHBOARD_STATS, load_dashboard_stats),
+        response_cache.body(CACHE_ANNOUNCEMENTS, load_announcements),
+        response_cache.body(CACHE_ACTIVE_IMAM, load_active_imam),
+        load_prayer_times(today),
+        fetch_page_docs(db.members, {"is_active": True}, "created_at", None, members_limit, False, MEMBER_PROJECTION)
+        if members_limit else no_members_page(),
+    )
+    parts = [
+        b'{"dashboard":', dashboard,
+        b',"announcements":', announcements,
+        b',"active_imam":', imam,
+        b',"prayer_times":', orjson.dumps(prayer_times.dict()),
+    ]
+    if members_limit:
+        parts += [b',"members":', orjson.dumps(members), b',"members_next_cursor":', orjson.dumps(members_cursor)]
+    body = b"".join(parts + [b"}"])
+
+    headers = {"Vary": "Accept-Encoding"}
+    if len(body) >= BOOTSTRAP_GZIP_MIN_SIZE and "gzip" in request.headers.get("accept-encoding", ""):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # gzip container
+        body = compressor.compress(body) + compressor.flush()
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# Live Events Route
+@api_router.get("/events")
+async def get_events():
+    today = datetime.now().strftime('%Y-%m-%d')
+    dashboard, prayer_times = await asyncio.gather(load_dashboard_stats(), load_prayer_times(today))
+    initial = [("dashboard", dashboard), ("prayer_times", prayer_times.dict())]
+    return StreamingResponse(
+        event_broker.stream(initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Export Routes
+@api_router.get("/export/payments")
+async def export_payments(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    payment_type: Optional[str] = None,
+    format: Literal["csv", "xlsx"] = "csv",
+    gzip: bool = False,
+):
+    query = export_query("payment_date", from_date, to_date, payment_type=payment_type)
+    return await export_response(
+        db.payments, query, [("payment_date", ASCENDING), ("id", ASCENDING)],
+        list(Payment.model_fields), "payments", format, gzip
+    )
+
+@api_router.get("/export/members")
+async def export_members(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    format: Literal["csv", "xlsx"] = "csv",
+    gzip: bool = False,
+):
+    query = export_query("created_at", from_date, to_date, is_active=True)
+    return await export_response(
+        db.members, query, [("is_active", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)],
+        list(Member.model_fields), "members", format, gzip
+    )
+
+# Reports Routes
+@api_router.get("/reports/arrears")
+async def get_arrears_report(months: int = Query(3, ge=1, le=120)):
+    period = recent_months(months)
+    coverage = await db.chanda_coverage.find(
+        {"year": {"$in": sorted({year for year, _ in period})}}, {"_id": 0}
+    ).to_list(None)
+    coverage = {(row["member_id"], row["year"]): row["months"] for row in coverage}
+
+    defaulters = []
+    async for member in db.members.find(
+        {"is_active": True}, {"_id": 0, "id": 1, "name": 1, "account_number": 1, "phone": 1, "created_at": 1}
+    ):
+        joined = member["created_at"].year * 12 + member["created_at"].month - 1
+        missing = [
+            month_label(year, month) for year, month in period
+            if year * 12 + month >= joined and not coverage.get((member["id"], year), 0) >> month & 1
+        ]
+        if missing:
+            defaulters.append({**member, "missing_months": missing})
+
+    defaulters.sort(key=lambda member: (-len(member["missing_months"]), member["name"]))
+    return {
+        "months": [month_label(year, month) for year, month in period],
+        "defaulters": defaulters,
+    }
+
+# Financial reports are read from the rollup collections, never from payments
+REPORT_YEAR = Query(None, ge=2000, le=2100)
+REPORT_PAYMENT_TYPE = Query(None, pattern=r"^\w+$")
+TOP_DONORS_MAX = 100
+TREND_MAX_POINTS = 1000
+
+def week_start(day: str) -> str:
+    """The Monday of the week containing the YYYY-MM-DD day"""
+    parsed = date.fromisoformat(day)
+    return (parsed - timedelta(days=parsed.weekday())).isoformat()
+
+def sum_rollups(rows: List[dict]) -> dict:
+    """Fold {payment_type, total, count} rollup rows into totals and per-type totals"""
+    summary = {"total": 0, "count": 0, "by_type": {}}
+    for row in rows:
+        summary["total"] += row["total"]
+        summary["count"] += row["count"]
+        summary["by_type"][row["payment_type"]] = summary["by_type"].get(row["payment_type"], 0) + row["total"]
+    return summary
+
+async def monthly_rollups(from_year: int, to_year: int) -> List[dict]:
+    # "YYYY-" sorts before every "YYYY-MM", so this is an index range scan over whole years
+    return await db.payment_rollups.find(
+        {"month": {"$gte": f"{from_year:04d}-", "$lt": f"{to_year + 1:04d}-"}}, {"_id": 0}
+    ).to_list(None)
+
+@api_router.get("/reports/monthly")
+async def get_monthly_report(year: Optional[int] = REPORT_YEAR):
+    year = year or date.today().year
+    rows = await monthly_rollups(year, year)
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(row["month"], []).append(row)
+    return {
+        "year": year,
+        **sum_rollups(rows),
+        "months": [
+            {"month": month_label(year, month), **sum_rollups(by_month.get(month_label(year, month), []))}
+            for month in range(12)
+        ],
+    }
+
+@api_router.get("/reports/yearly")
+async def get_yearly_report(from_year: Optional[int] = REPORT_YEAR, to_year: Optional[int] = REPORT_YEAR):
+    to_year = to_year or date.today().year
+    from_year = from_year or to_year - 4
+    if from_year > to_year:
+        raise HTTPException(status_code=400, detail="from_year must not be after to_year")
+    by_year = {}
+    for row in await monthly_rollups(from_year, to_year):
+        by_year.setdefault(int(row["month"][:4]), []).append(row)
+    return {
+        "years": [{"year": year, **sum_rollups(by_year.get(year, []))} for year in range(from_year, to_year + 1)],
     }
 
+@api_router.get("/reports/top-donors")
+async def get_top_donors(
+    year: Optional[int] = REPORT_YEAR,
+    payment_type: Optional[str] = REPORT_PAYMENT_TYPE,
+    limit: int = Query(10, ge=1, le=TOP_DONORS_MAX),
+):
+    match = {"year": year} if year else {}
+    prefix = ""
+    if payment_type:
+        prefix = f"by_type.{payment_type}."
+        match[f"{prefix}count"] = {"$gt": 0}
+    donors = await db.donor_rollups.aggregate([
+        {"$match": match},
+        {"$group": {"_id": "$member_id", "total": {"$sum": f"${prefix}total"}, "count": {"$sum": f"${prefix}count"}}},
+        {"$sort": {"total": -1, "_id": 1}},
+        {"$limit": limit},
+    ]).to_list(None)
+
+    # Former members keep their place in the ranking, so look names up regardless of is_active
+    fields = {"_id": 0, "id": 1, "name": 1, "account_number": 1}
+    member_ids = [donor["_id"] for donor in donors]
+    members = await db.members.find({"id": {"$in": member_ids}}, fields).to_list(None)
+    members = {member["id"]: member for member in members}
+    missing = [member_id for member_id in member_ids if member_id not in members]
+    if missing:
+        for member in await find_archived_members(missing, fields):
+            members[member["id"]] = member
+    return {
+        "year": year,
+        "payment_type": payment_type,
+        "donors": [
+            {
+                "member_id": donor["_id"],
+                "name": members.get(donor["_id"], {}).get("name"),
+                "account_number": members.get(donor["_id"], {}).get("account_number"),
+                "total": donor["total"],
+                "count": donor["count"],
+            }
+            for donor in donors
+        ],
+    }
+
+@api_router.get("/reports/trends")
+async def get_trends_report(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    interval: Literal["day", "week", "month"] = "month",
+    payment_type: Optional[str] = REPORT_PAYMENT_TYPE,
+):
+    """Collections per period; day and week follow payment_date, month follows the rollup month"""
+    to_date = to_date or date.today()
+    from_date = from_date or to_date - timedelta(days=365)
+    if from_date > to_date:
+        raise HTTPException(status_code=400, detail="from must not be after to")
+
+    if interval == "month":
+        months = (to_date.year * 12 + to_date.month) - (from_date.year * 12 + from_date.month) + 1
+        periods = [month_label(year, month) for year, month in recent_months(months, to_date)]
+        collection, key = db.payment_rollups, "month"
+        query = {"month": {"$gte": periods[0], "$lte": periods[-1]}}
+        period_of = lambda value: value
+    else:
+        step = 1 if interval == "day" else 7
+        first = from_date - timedelta(days=from_date.weekday() if interval == "week" else 0)
+        periods = [(first + timedelta(days=offset)).isoformat() for offset in range(0, (to_date - first).days + 1, step)]
+        collection, key = db.payment_daily_rollups, "day"
+        query = {"day": {"$gte": from_date.isoformat(), "$lte": to_date.isoformat()}}
+        period_of = (lambda value: value) if interval == "day" else week_start
+    if len(periods) > TREND_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"Range has more than {TREND_MAX_POINTS} {interval}s")
+    if payment_type:
+        query["payment_type"] = payment_type
+
+    totals = {period: [0, 0] for period in periods}
+    async for row in collection.find(query, {"_id": 0, key: 1, "total": 1, "count": 1}):
+        bucket = totals.get(period_of(row[key]))
+        if bucket is not None:
+            bucket[0] += row["total"]
+            bucket[1] += row["count"]
+
+    points, previous = [], None
+    for period in periods:
+        total, count = totals[period]
+        change = (total - previous) / previous if previous else None
+        points.append({"period": period, "total": total, "count": count, "change": change})
+        previous = total
+    return {"interval": interval, "from": from_date, "to": to_date, "payment_type": payment_type, "points": points}
+
+# Audit Routes
+# Unlike the regular read routes these also read archived payments and members.
+@api_router.get("/audit/payments")
+async def get_audit_payments(
+    member_id: Optional[str] = None,
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    payment_type: Optional[str] = None,
+):
+    if not (member_id or from_date or to_date):
+        raise HTTPException(status_code=400, detail="Filter by member_id or a from/to date range")
+    query = export_query("payment_date", from_date, to_date, member_id=member_id, payment_type=payment_type)
+    hot, archived = await asyncio.gather(
+        db.payments.find(query, {"_id": 0}).to_list(None),
+        find_archived_payments(query),
+    )
+    payments = [{**payment, "archived": False} for payment in hot] + [{**payment, "archived": True} for payment in archived]
+    payments.sort(key=lambda payment: payment["payment_date"], reverse=True)
+    return ORJSONResponse(payments)
+
+@api_router.get("/audit/members/{member_id}")
+async def get_audit_member(member_id: str):
+    member = await db.members.find_one({"id": member_id}, {"_id": 0, "name_tokens": 0})
+    if member:
+        return ORJSONResponse({**member, "archived": False})
+    member = await find_archived_member(member_id)
+    if member is None:
+        raise HTTPException(status_code=404, detail="Member not found")
+    return ORJSONResponse({**member, "archived": True})
+
+# Admin Routes
+@api_router.get("/admin/indexes")
+async def get_index_report():
+    collections = {}
+    for collection_name in INDEX_SPECS:
+        collection = db[collection_name]
+        usage = await collection.aggregate([{"$indexStats": {}}]).to_list(None)
+        stats = await db.command("collStats", collection_name)
+        sizes = stats.get("indexSizes", {})
+        collections[collection_name] = {
+            "documents": stats.get("count", 0),
+            "indexes": [
+                {
+                    "name": index["name"],
+                    "key": index["key"],
+                    "accesses": index["accesses"]["ops"],
+                    "since": index["accesses"]["since"],
+                    "size_bytes": sizes.get(index["name"], 0),
+                }
+                for index in usage
+            ],
+        }
+
+    queries = []
+    for collection_name, handler, query, sort in AUDIT_QUERIES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+        queries.append({
+            "collection": collection_name,
+            "handler": handler,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+
+    return {"collections": collections, "queries": queries}
+
+@api_router.get("/admin/cache")
+async def get_cache_stats():
+    return response_cache.stats()
+
+@api_router.post("/admin/rollups/rebuild")
+async def rebuild_rollups():
+    rows, daily_rows, donor_rows = await asyncio.gather(
+        rebuild_payment_rollups(), rebuild_daily_rollups(), rebuild_donor_rollups()
+    )
+    await dashboard_changed()
+    return {"message": "Payment rollups rebuilt", "rows": rows, "daily_rows": daily_rows, "donor_rows": donor_rows}
+
+@api_router.post("/admin/archive")
+async def archive_cold_data(
+    before_fiscal_year: Optional[int] = Query(None, ge=2000, le=2100),
+    target: Optional[Literal["collection", "ndjson"]] = None,
+):
+    return await run_archival(before_fiscal_year, target)
+
+@api_router.post("/admin/coverage/rebuild")
+async def rebuild_coverage():
+    rows = await rebuild_chanda_coverage()
+    return {"message": "Chanda coverage rebuilt", "rows": rows}
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -326,7 +2504,13 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Idempotent-Replayed", "ETag", "Last-Modified"],
 )
+app.add_middleware(metrics.PrometheusMiddleware)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return metrics.metrics_response()
 
 # Configure logging
 logging.basicConfig(
@@ -335,6 +2519,85 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Set STARTUP_PROFILE=1 to log how long each startup hook and the first response take
+STARTUP_PROFILE = os.environ.get('STARTUP_PROFILE') == '1'
+startup_began = None
+
+def startup_hook(func):
+    """Register func as a startup hook, timing it when STARTUP_PROFILE is on"""
+    if not STARTUP_PROFILE:
+        return app.on_event("startup")(func)
+
+    async def timed():
+        global startup_began
+        startup_began = startup_began or time.perf_counter()
+        started = time.perf_counter()
+        await func()
+        logger.info(f"Startup hook {func.__name__} took {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    timed.__name__ = func.__name__
+    app.on_event("startup")(timed)
+    return func
+
+if STARTUP_PROFILE:
+    @app.middleware("http")
+    async def log_first_response(request, call_next):
+        global startup_began
+        response = await call_next(request)
+        if startup_began is not None:
+            logger.info(f"First response ({request.url.path}) {(time.perf_counter() - startup_began) * 1000:.1f} ms after startup began")
+            startup_began = None
+        return response
+
+@startup_hook
+async def connect_db_client():
+    connect_db()
+
+@startup_hook
+async def connect_http_client():
+    global http_client
+    import httpx
+
+    http_client = httpx.AsyncClient(
+        timeout=HTTP_TIMEOUT,
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS)
+    )
+
+@startup_hook
+async def create_db_indexes():
+    await migrate_transaction_id_index()
+    await ensure_indexes()
+    await backfill_member_search()
+    await backfill_payment_archive_files()
+
+@startup_hook
+async def start_prayer_times_prefetch():
+    background_tasks.add(asyncio.create_task(prefetch_prayer_times_forever()))
+
+@startup_hook
+async def start_member_directory():
+    await member_directory.load()
+    background_tasks.add(asyncio.create_task(refresh_member_directory_forever()))
+    background_tasks.add(asyncio.create_task(fan_out_member_renames_forever()))
+
+@startup_hook
+async def start_event_feed():
+    background_tasks.add(asyncio.create_task(watch_changes_forever()))
+    background_tasks.add(asyncio.create_task(publish_prayer_times_forever()))
+    if event_relay:
+        background_tasks.add(asyncio.create_task(event_relay.listen_forever()))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    for task in background_tasks:
+        task.cancel()
+    if http_client:
+        await http_client.aclose()
+    await response_cache.backend.close()
+    await versions.close()
+    if event_relay:
+        await event_relay.close()
+    if receipt_pool:
+        receipt_pool.shutdown(cancel_futures=True)
+    if client:
+        client.close()
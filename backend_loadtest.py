@@ -0,0 +1,330 @@
+"""Async load generator and latency benchmark for the Masjid Management API.
+
+Runs the scenarios from backend_test.py (member CRUD, payments, dashboard,
+prayer times, announcements) as a weighted mix from many concurrent clients,
+then reports throughput and p50/p95/p99 latency per endpoint. Results are
+written as JSON so a later run can be compared against them.
+
+Examples:
+    # Start a local backend against a local mongod, seed it and run for 30s
+    python backend_loadtest.py --start-server --mongo-url mongodb://localhost:27017 \\
+        --seed-members 5000 --seed-payments 50000 --duration 30 --output run.json
+
+    # Re-run and fail if any endpoint's p95 regressed by more than 20%
+    python backend_loadtest.py --duration 30 --output run2.json --compare run.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+from backend_test import member_payload, payment_payload
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+
+# Scenario name -> relative weight in the default mix
+DEFAULT_MIX = {
+    "dashboard": 20,
+    "prayer_times": 20,
+    "announcements": 15,
+    "list_members": 8,
+    "get_member": 10,
+    "search_members": 5,
+    "member_payments": 5,
+    "list_payments": 5,
+    "create_payment": 6,
+    "create_member": 2,
+    "update_member": 2,
+    "create_announcement": 1,
+    "root": 1,
+}
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.member_ids = []
+        self.latencies = {}
+        self.errors = {}
+
+    async def request(self, endpoint, method, url, **kwargs):
+        """Time one request and record it under endpoint; returns the response or None"""
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        self.latencies.setdefault(endpoint, []).append(time.perf_counter() - started)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            return None
+        return response
+
+    def random_member(self):
+        return random.choice(self.member_ids) if self.member_ids else None
+
+    # Scenarios
+    async def root(self):
+        await self.request("GET /api/", "GET", "/api/")
+
+    async def dashboard(self):
+        await self.request("GET /api/dashboard/stats", "GET", "/api/dashboard/stats")
+
+    async def prayer_times(self):
+        await self.request("GET /api/prayer-times", "GET", "/api/prayer-times")
+
+    async def announcements(self):
+        await self.request("GET /api/announcements", "GET", "/api/announcements")
+
+    async def create_announcement(self):
+        await self.request("POST /api/announcements", "POST", "/api/announcements", json={
+            "title": "Load test", "content": "Jumma at 1:15 PM", "created_by": "loadtest"
+        })
+
+    async def list_members(self):
+        await self.request("GET /api/members", "GET", "/api/members", params={"limit": 50})
+
+    async def get_member(self):
+        member_id = self.random_member()
+        if member_id:
+            await self.request("GET /api/members/{id}", "GET", f"/api/members/{member_id}")
+
+    async def search_members(self):
+        await self.request("GET /api/members/search", "GET", "/api/members/search",
+                           params={"q": random.choice(["test", "mem", "9876543210", "MM"])})
+
+    async def create_member(self):
+        response = await self.request("POST /api/members", "POST", "/api/members",
+                                      json=member_payload(uuid.uuid4().hex[:12]))
+        if response:
+            self.member_ids.append(response.json()["id"])
+
+    async def update_member(self):
+        member_id = self.random_member()
+        if member_id:
+            await self.request("PUT /api/members/{id}", "PUT", f"/api/members/{member_id}",
+                               json=member_payload(uuid.uuid4().hex[:12]))
+
+    async def create_payment(self):
+        member_id = self.random_member()
+        if member_id:
+            await self.request("POST /api/payments", "POST", "/api/payments",
+                               json=payment_payload(member_id, uuid.uuid4().hex))
+
+    async def list_payments(self):
+        await self.request("GET /api/payments", "GET", "/api/payments", params={"limit": 50})
+
+    async def member_payments(self):
+        member_id = self.random_member()
+        if member_id:
+            await self.request("GET /api/payments/member/{id}", "GET", f"/api/payments/member/{member_id}")
+
+    # Setup
+    async def seed(self, members: int, payments: int):
+        """Bulk-load members and payments through the import endpoints"""
+        if members:
+            rows = ["name,phone,email,address,id_proof_type,id_proof_number"]
+            run = uuid.uuid4().hex[:6]
+            for i in range(members):
+                rows.append(f"Seed Member {i},9{i:09d},seed{i}@example.com,\"{i} Masjid Road, Ripponpet\",Aadhar,SEED{run}{i}")
+            response = await self.client.post("/api/members/bulk", timeout=300,
+                                              files={"file": ("members.csv", "\n".join(rows), "text/csv")})
+            response.raise_for_status()
+            print(f"Seeded {response.json()['inserted']} members")
+
+        await self.load_member_ids()
+        if payments and self.member_ids:
+            rows = ["member_id,transaction_id,amount,date"]
+            for i in range(payments):
+                rows.append(f"{random.choice(self.member_ids)},SEED{uuid.uuid4().hex},{random.choice([100, 250, 500, 1000])},"
+                            f"{datetime(2024 + i % 2, i % 12 + 1, i % 28 + 1):%Y-%m-%d}")
+            response = await self.client.post("/api/payments/bulk", timeout=600,
+                                              params={"payment_type": "monthly_chanda"},
+                                              files={"file": ("payments.csv", "\n".join(rows), "text/csv")})
+            response.raise_for_status()
+            print(f"Seeded {len(response.json()['matched'])} payments")
+
+    async def load_member_ids(self):
+        response = await self.client.get("/api/members", params={"limit": 1000})
+        response.raise_for_status()
+        self.member_ids = [member["id"] for member in response.json()]
+
+    async def run(self, mix, concurrency: int, duration: float):
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                await getattr(self, random.choices(names, weights)[0])()
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        return time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    endpoints = {}
+    for endpoint, values in sorted(latencies.items()):
+        values = sorted(values)
+        endpoints[endpoint] = {
+            "requests": len(values),
+            "errors": errors.get(endpoint, 0),
+            "throughput_rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+            "max_ms": values[-1] * 1000,
+        }
+    total = sum(len(values) for values in latencies.values())
+    return {
+        "elapsed_s": elapsed,
+        "requests": total,
+        "errors": sum(errors.values()),
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def print_report(summary):
+    print(f"\n{'endpoint':<34}{'reqs':>7}{'err':>5}{'rps':>8}{'p50':>8}{'p95':>8}{'p99':>8}  (ms)")
+    for endpoint, stats in summary["endpoints"].items():
+        print(f"{endpoint:<34}{stats['requests']:>7}{stats['errors']:>5}{stats['throughput_rps']:>8.1f}"
+              f"{stats['p50_ms']:>8.1f}{stats['p95_ms']:>8.1f}{stats['p99_ms']:>8.1f}")
+    print(f"\nTotal: {summary['requests']} requests, {summary['errors']} errors, "
+          f"{summary['throughput_rps']:.1f} req/s over {summary['elapsed_s']:.1f}s")
+
+
+def compare(summary, baseline, threshold):
+    """Print endpoints whose p95 grew by more than threshold; returns True if any did"""
+    regressed = False
+    for endpoint, stats in summary["endpoints"].items():
+        before = baseline["endpoints"].get(endpoint)
+        if not before or not before["p95_ms"]:
+            continue
+        change = stats["p95_ms"] / before["p95_ms"] - 1
+        if change > threshold:
+            regressed = True
+            print(f"❌ {endpoint}: p95 {before['p95_ms']:.1f} -> {stats['p95_ms']:.1f} ms (+{change:.0%})")
+    if not regressed:
+        print(f"✅ No endpoint's p95 regressed by more than {threshold:.0%}")
+    return regressed
+
+
+def parse_mix(value):
+    mix = dict(DEFAULT_MIX)
+    if value:
+        for item in value.split(","):
+            name, weight = item.split("=")
+            if name not in DEFAULT_MIX:
+                raise argparse.ArgumentTypeError(f"Unknown scenario '{name}'")
+            mix[name] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def start_server(port, mongo_url, db_name, workers):
+    env = {**os.environ, "MONGO_URL": mongo_url, "DB_NAME": db_name}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--workers", str(workers)],
+        cwd=BACKEND_DIR, env=env
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("Backend failed to start")
+
+
+async def main_async(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+        test = LoadTest(client)
+        await test.seed(args.seed_members, args.seed_payments)
+        if not test.member_ids:
+            await test.load_member_ids()
+        if args.warmup:
+            await test.run(args.mix, args.concurrency, args.warmup)
+            test.latencies, test.errors = {}, {}
+        elapsed = await test.run(args.mix, args.concurrency, args.duration)
+    return summarize(test.latencies, test.errors, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Masjid Management API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8001")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of unmeasured load first")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(None),
+                        help="weight overrides, e.g. dashboard=50,create_payment=0")
+    parser.add_argument("--seed-members", type=int, default=0)
+    parser.add_argument("--seed-payments", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p95 growth against the baseline")
+    parser.add_argument("--start-server", action="store_true", help="start a local uvicorn for the run")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="masjid_loadtest")
+    args = parser.parse_args()
+
+    server = None
+    if args.start_server:
+        args.base_url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args.port, args.mongo_url, args.db_name, args.workers)
+    try:
+        summary = asyncio.run(main_async(args))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print_report(summary)
+    result = {
+        "timestamp": datetime.now().isoformat(),
+        "config": {
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "mix": args.mix,
+            "workers": args.workers,
+        },
+        **summary,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2))
+        print(f"Results written to {args.output}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if compare(summary, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
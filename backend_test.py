@@ -1,8 +1,37 @@
+import io
 import requests
 import unittest
 import sys
+import zipfile
 from datetime import datetime
 
+def member_payload(suffix, is_committee=False):
+    """Request body for POST /api/members; suffix keeps email and id proof unique"""
+    return {
+        "name": f"Test Member {suffix}",
+        "phone": f"9876543210",
+        "email": f"test{suffix}@example.com",
+        "address": "123 Test Street, Test City",
+        "id_proof_type": "Aadhar",
+        "id_proof_number": f"AADHAR{suffix}",
+        "is_committee_member": is_committee,
+        "committee_position": "Secretary" if is_committee else None
+    }
+
+def letters(digits):
+    """Digits spelt as letters a-j, for name words no other member shares"""
+    return "".join(chr(ord("a") + int(digit)) for digit in digits)
+
+def payment_payload(member_id, suffix):
+    """Request body for POST /api/payments; suffix keeps the transaction id unique"""
+    return {
+        "member_id": member_id,
+        "amount": 500.00,
+        "payment_type": "monthly_chanda",
+        "transaction_id": f"TXN{suffix}",
+        "month_year": datetime.now().strftime('%Y-%m')
+    }
+
 class MasjidManagementAPITester:
     def __init__(self, base_url):
         self.base_url = base_url
@@ -10,24 +39,31 @@ class MasjidManagementAPITester:
         self.tests_passed = 0
         self.test_member_id = None
         self.test_payment_id = None
+        self.test_account_number = None
+        self.last_response = None
 
-    def run_test(self, name, method, endpoint, expected_status, data=None):
-        """Run a single API test"""
+    def run_test(self, name, method, endpoint, expected_status, data=None, headers=None, files=None, params=None):
+        """Run a single API test; the raw response is kept in self.last_response"""
         url = f"{self.base_url}/{endpoint}"
-        headers = {'Content-Type': 'application/json'}
+        # requests sets the multipart Content-Type itself for uploads
+        headers = {**({} if files else {'Content-Type': 'application/json'}), **(headers or {})}
         
         self.tests_run += 1
         print(f"\n🔍 Testing {name}...")
         
         try:
             if method == 'GET':
-                response = requests.get(url, headers=headers)
+                response = requests.get(url, headers=headers, params=params)
             elif method == 'POST':
-                response = requests.post(url, json=data, headers=headers)
+                if files:
+                    response = requests.post(url, files=files, headers=headers, params=params)
+                else:
+                    response = requests.post(url, json=data, headers=headers, params=params)
             elif method == 'PUT':
                 response = requests.put(url, json=data, headers=headers)
             elif method == 'DELETE':
                 response = requests.delete(url, headers=headers)
+            self.last_response = response
 
             success = response.status_code == expected_status
             if success:
@@ -101,16 +137,7 @@ class MasjidManagementAPITester:
     def test_create_member(self, is_committee=False):
         """Test creating a new member"""
         timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        member_data = {
-            "name": f"Test Member {timestamp}",
-            "phone": f"9876543210",
-            "email": f"test{timestamp}@example.com",
-            "address": "123 Test Street, Test City",
-            "id_proof_type": "Aadhar",
-            "id_proof_number": f"AADHAR{timestamp}",
-            "is_committee_member": is_committee,
-            "committee_position": "Secretary" if is_committee else None
-        }
+        member_data = member_payload(timestamp, is_committee)
         
         success, response = self.run_test(
             f"Create {'Committee' if is_committee else 'Regular'} Member",
@@ -122,7 +149,7 @@ class MasjidManagementAPITester:
         
         if success:
             self.test_member_id = response.get('id')
-            account_number = response.get('account_number', '')
+            self.test_account_number = account_number = response.get('account_number', '')
             print(f"Created Member ID: {self.test_member_id}")
             print(f"Account Number: {account_number}")
             
@@ -165,13 +192,7 @@ class MasjidManagementAPITester:
 
     def test_create_payment(self, member_id):
         """Test creating a payment"""
-        payment_data = {
-            "member_id": member_id,
-            "amount": 500.00,
-            "payment_type": "monthly_chanda",
-            "transaction_id": f"TXN{datetime.now().strftime('%Y%m%d%H%M%S')}",
-            "month_year": datetime.now().strftime('%Y-%m')
-        }
+        payment_data = payment_payload(member_id, datetime.now().strftime('%Y%m%d%H%M%S'))
         
         success, response = self.run_test(
             "Create Payment",
@@ -210,6 +231,21 @@ class MasjidManagementAPITester:
         
         return success
 
+    def test_get_payments_page(self):
+        """Test keyset pagination of payments"""
+        success, response = self.run_test(
+            "Get Payments Page",
+            "GET",
+            "api/payments?limit=1",
+            200
+        )
+
+        if success and isinstance(response, list) and len(response) > 1:
+            print("❌ Page size limit not applied")
+            success = False
+
+        return success
+
     def test_get_member_payments(self, member_id):
         """Test getting payments for a specific member"""
         success, response = self.run_test(
@@ -224,6 +260,251 @@ class MasjidManagementAPITester:
         
         return success
 
+    def test_bulk_import_members(self):
+        """Test CSV member import, with a row repeated within the file"""
+        suffix = datetime.now().strftime('%Y%m%d%H%M%S')
+        rows = [
+            f"Bulk Member {suffix} A,9000000001,1 Masjid Road,Aadhar,BULKA{suffix}",
+            f"Bulk Member {suffix} B,9000000002,2 Masjid Road,Aadhar,BULKB{suffix}",
+            f"Bulk Member {suffix} B,9000000002,2 Masjid Road,Aadhar,BULKB{suffix}",
+        ]
+        csv = "name,phone,address,id_proof_type,id_proof_number\n" + "\n".join(rows) + "\n"
+        success, response = self.run_test(
+            "Bulk Import Members",
+            "POST",
+            "api/members/bulk",
+            200,
+            files={"file": ("members.csv", csv, "text/csv")}
+        )
+
+        if success:
+            print(f"Inserted: {response.get('inserted')}, duplicates: {len(response.get('duplicates', []))}")
+            if response.get('inserted') != 2 or len(response.get('duplicates', [])) != 1:
+                print("❌ Expected 2 inserted and 1 duplicate")
+                success = False
+
+        return success
+
+    def test_bulk_import_members_not_utf8(self):
+        """Test that a CSV saved as cp1252 keeps the rows before the first non-UTF-8 byte"""
+        suffix = datetime.now().strftime('%Y%m%d%H%M%S')
+        csv = (
+            "name,phone,address,id_proof_type,id_proof_number\n"
+            f"Bulk Member {suffix} C,9000000003,3 Masjid Road,Aadhar,BULKC{suffix}\n"
+        ).encode() + f"José {suffix},9000000004,4 Masjid Road,Aadhar,BULKD{suffix}\n".encode("cp1252")
+        success, response = self.run_test(
+            "Bulk Import Members From A Non-UTF-8 CSV",
+            "POST",
+            "api/members/bulk",
+            200,
+            files={"file": ("members.csv", csv, "text/csv")}
+        )
+
+        if success:
+            print(f"Inserted: {response.get('inserted')}, errors: {response.get('errors')}")
+            if response.get('inserted') != 1 or [error.get('row') for error in response.get('errors', [])] != [2]:
+                print("❌ Expected the first row inserted and an error at row 2")
+                success = False
+
+        return success
+
+    def test_bulk_import_payments(self, account_number):
+        """Test statement import: matched, repeated UTR, unknown member and unknown payment type"""
+        suffix = datetime.now().strftime('%Y%m%d%H%M%S')
+        rows = [
+            f"UTRA{suffix},250,{account_number},donation",
+            f"UTRA{suffix},250,{account_number},donation",
+            f"UTRB{suffix},250,MM00000000,donation",
+            f"UTRC{suffix},250,{account_number},zakat",
+        ]
+        csv = "UTR No,Credit,Account Number,Payment Type\n" + "\n".join(rows) + "\n"
+        success, response = self.run_test(
+            "Bulk Import Payments",
+            "POST",
+            "api/payments/bulk",
+            200,
+            files={"file": ("statement.csv", csv, "text/csv")}
+        )
+
+        if success:
+            counts = {key: len(response.get(key, [])) for key in ("matched", "duplicates", "unmatched", "errors")}
+            print(f"Import report: {counts}")
+            if counts != {"matched": 1, "duplicates": 1, "unmatched": 1, "errors": 1}:
+                print("❌ Expected one row of each kind")
+                success = False
+
+        return success
+
+    def test_search_members(self):
+        """Test member search by account number and by a misspelt name"""
+        suffix = datetime.now().strftime('%Y%m%d%H%M%S')
+        word = letters(suffix[-8:])
+        member_data = {**member_payload(f"S{suffix}"), "name": f"Rafeeq {word.capitalize()}"}
+        success, member = self.run_test("Create Member To Search", "POST", "api/members", 200, data=member_data)
+        if not success:
+            return False
+
+        success, response = self.run_test(
+            "Search Members By Account Number",
+            "GET",
+            "api/members/search",
+            200,
+            params={"q": member["account_number"]}
+        )
+        if success and (not response or response[0].get('id') != member['id']):
+            print("❌ Member not first for its account number")
+            success = False
+
+        # One edit in each word
+        query = f"rafeq {word[:-1]}z"
+        found, response = self.run_test(
+            "Search Members By Misspelt Name",
+            "GET",
+            "api/members/search",
+            200,
+            params={"q": query}
+        )
+        if found:
+            print(f"'{query}' matched {[result.get('name') for result in response]}")
+            if member['id'] not in [result.get('id') for result in response]:
+                print("❌ Misspelt name not found")
+                found = False
+
+        return success and found
+
+    def test_idempotent_payment(self, member_id):
+        """Test Idempotency-Key replay, key reuse with another body (422) and a repeated UTR (409)"""
+        suffix = datetime.now().strftime('%Y%m%d%H%M%S')
+        payment_data = payment_payload(member_id, f"IDEM{suffix}")
+        headers = {"Idempotency-Key": f"test-{suffix}"}
+
+        success, first = self.run_test("Create Payment With Idempotency-Key", "POST", "api/payments", 200,
+                                       data=payment_data, headers=headers)
+        replayed, second = self.run_test("Replay Payment With Same Idempotency-Key", "POST", "api/payments", 200,
+                                         data=payment_data, headers=headers)
+        if replayed:
+            if second.get('id') != first.get('id') or self.last_response.headers.get('Idempotent-Replayed') != 'true':
+                print("❌ Retry was not answered with the first payment")
+                replayed = False
+
+        reused, _ = self.run_test("Reuse Idempotency-Key With Another Body", "POST", "api/payments", 422,
+                                  data={**payment_data, "amount": 1.0}, headers=headers)
+        duplicate, _ = self.run_test("Create Payment With Recorded Transaction ID", "POST", "api/payments", 409,
+                                     data=payment_data)
+
+        return success and replayed and reused and duplicate
+
+    def test_conditional_get(self):
+        """Test ETag revalidation of announcements (304) and a new ETag after a write"""
+        success, _ = self.run_test("Get Announcements", "GET", "api/announcements", 200)
+        etag = self.last_response.headers.get('ETag') if success else None
+        if not etag:
+            print("❌ No ETag on announcements")
+            return False
+
+        not_modified, _ = self.run_test("Revalidate Announcements", "GET", "api/announcements", 304,
+                                        headers={"If-None-Match": etag})
+        created, _ = self.run_test("Create Announcement", "POST", "api/announcements", 200, data={
+            "title": "Test Announcement", "content": "Conditional GET test", "created_by": "backend_test"
+        })
+        changed, _ = self.run_test("Revalidate Announcements After Write", "GET", "api/announcements", 200,
+                                   headers={"If-None-Match": etag})
+        if changed and self.last_response.headers.get('ETag') == etag:
+            print("❌ ETag unchanged after a write")
+            changed = False
+
+        return not_modified and created and changed
+
+    def test_member_dues(self, member_id):
+        """Test member dues and the arrears report, both read from the chanda bitmap"""
+        this_month = datetime.now().strftime('%Y-%m')
+        success, response = self.run_test("Get Member Dues", "GET", f"api/members/{member_id}/dues", 200)
+        if success:
+            print(f"Paid months: {response.get('paid_months')}, missing: {response.get('missing_months')}")
+            if this_month not in response.get('paid_months', []):
+                print(f"❌ {this_month} chanda not counted as paid")
+                success = False
+
+        arrears, response = self.run_test("Get Arrears Report", "GET", "api/reports/arrears", 200, params={"months": 3})
+        if arrears and member_id in [member.get('id') for member in response.get('defaulters', [])]:
+            if this_month in next(m for m in response['defaulters'] if m['id'] == member_id)['missing_months']:
+                print(f"❌ Member listed as owing {this_month}")
+                arrears = False
+
+        return success and arrears
+
+    def test_rollup_rebuild(self, member_id):
+        """Test that rebuilding rollups from payments reproduces the incrementally kept ones"""
+        # A blank month_year rolls up under the payment date's month on both paths
+        payment_data = {**payment_payload(member_id, f"BLANK{datetime.now().strftime('%Y%m%d%H%M%S')}"),
+                        "payment_type": "donation", "month_year": ""}
+        created, response = self.run_test("Create Payment With Blank month_year", "POST", "api/payments", 200,
+                                          data=payment_data)
+        if created and response.get('month_year') is not None:
+            print("❌ Blank month_year not stored as null")
+            created = False
+
+        before_ok, before = self.run_test("Get Monthly Report Before Rebuild", "GET", "api/reports/monthly", 200)
+        rebuilt, _ = self.run_test("Rebuild Rollups", "POST", "api/admin/rollups/rebuild", 200)
+        after_ok, after = self.run_test("Get Monthly Report After Rebuild", "GET", "api/reports/monthly", 200)
+        same = before_ok and after_ok and before == after
+        if before_ok and after_ok and not same:
+            print(f"❌ Rebuilt report differs: {before} != {after}")
+
+        return created and rebuilt and same
+
+    def test_reports(self):
+        """Test the financial reports served from rollups"""
+        this_month = datetime.now().strftime('%Y-%m')
+        monthly, response = self.run_test("Get Monthly Report", "GET", "api/reports/monthly", 200)
+        if monthly:
+            months = {month.get('month'): month for month in response.get('months', [])}
+            if len(months) != 12 or months.get(this_month, {}).get('total', 0) <= 0:
+                print(f"❌ Expected 12 months with a collection in {this_month}")
+                monthly = False
+
+        yearly, _ = self.run_test("Get Yearly Report", "GET", "api/reports/yearly", 200)
+        donors, _ = self.run_test("Get Top Donors", "GET", "api/reports/top-donors", 200)
+        trends, _ = self.run_test("Get Trends", "GET", "api/reports/trends", 200)
+
+        return monthly and yearly and donors and trends
+
+    def test_receipts(self, payment_id, member_id):
+        """Test the receipt PDF of one payment and the receipts ZIP of a member"""
+        success, _ = self.run_test("Get Receipt PDF", "GET", f"api/payments/{payment_id}/receipt.pdf", 200)
+        if success and not self.last_response.content.startswith(b"%PDF"):
+            print("❌ Receipt is not a PDF")
+            success = False
+
+        zipped, _ = self.run_test("Get Receipts ZIP", "GET", "api/payments/receipts.zip", 200,
+                                  params={"member_id": member_id})
+        if zipped:
+            names = zipfile.ZipFile(io.BytesIO(self.last_response.content)).namelist()
+            print(f"ZIP holds {len(names)} receipts")
+            if not names:
+                zipped = False
+
+        missing, _ = self.run_test("Get Receipt Of Unknown Payment", "GET", "api/payments/unknown/receipt.pdf", 404)
+        return success and zipped and missing
+
+    def test_bootstrap(self):
+        """Test the first-load bootstrap, without and with members"""
+        success, response = self.run_test("Get Bootstrap", "GET", "api/bootstrap", 200)
+        if success:
+            keys = sorted(response)
+            print(f"Bootstrap keys: {keys}")
+            if keys != ["active_imam", "announcements", "dashboard", "prayer_times"]:
+                print("❌ Unexpected bootstrap keys")
+                success = False
+
+        with_members, response = self.run_test("Get Bootstrap With Members", "GET", "api/bootstrap", 200,
+                                               params={"members_limit": 1})
+        if with_members and len(response.get('members', [])) != 1:
+            print("❌ members_limit=1 did not return one member")
+            with_members = False
+
+        return success and with_members
+
     def run_all_tests(self):
         """Run all API tests"""
         print("🚀 Starting Masjid Management System API Tests")
@@ -244,10 +525,23 @@ class MasjidManagementAPITester:
             payment_created = self.test_create_payment(self.test_member_id)
             if payment_created:
                 self.test_get_payments()
+                self.test_get_payments_page()
                 self.test_get_member_payments(self.test_member_id)
+                self.test_idempotent_payment(self.test_member_id)
+                self.test_member_dues(self.test_member_id)
+                self.test_reports()
+                self.test_rollup_rebuild(self.test_member_id)
+                self.test_receipts(self.test_payment_id, self.test_member_id)
+            self.test_bulk_import_payments(self.test_account_number)
         
         # Committee member test
         self.test_create_member(is_committee=True)
+
+        self.test_bulk_import_members()
+        self.test_bulk_import_members_not_utf8()
+        self.test_search_members()
+        self.test_conditional_get()
+        self.test_bootstrap()
         
         # Print test results
         print("\n=============================================")
@@ -4,18 +4,49 @@ set -e
 # Start the FastAPI backend
 cd /backend || { echo "Backend directory not found"; exit 1; }
 
-echo "Starting FastAPI backend"
+# Response caches, conditional-GET versions and live events are shared between workers
+# only through Redis, so without REDIS_URL a single worker is the default. With it, one
+# worker per core. WEB_CONCURRENCY overrides either.
+if [ -n "$REDIS_URL" ]; then
+    WORKERS=${WEB_CONCURRENCY:-$(nproc)}
+else
+    WORKERS=${WEB_CONCURRENCY:-1}
+    if [ "$WORKERS" -gt 1 ]; then
+        echo "WARNING: running $WORKERS workers without REDIS_URL. Each worker keeps its own response"
+        echo "WARNING: cache, so workers can serve stale data for up to CACHE_TTL after a write, and"
+        echo "WARNING: without a MongoDB replica set live events reach only one worker's screens."
+    fi
+fi
+# The backend trusts its in-memory state when it is the only worker
+export WEB_CONCURRENCY="$WORKERS"
+STARTUP_TIMEOUT=${STARTUP_TIMEOUT:-120}
+
+# Workers write their Prometheus samples here so /metrics can aggregate them
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+echo "Starting FastAPI backend with $WORKERS workers"
 # Start Uvicorn with proper host binding
-uvicorn server:app --host 0.0.0.0 --port 8001 &
+uvicorn server:app --host 0.0.0.0 --port 8001 --workers "$WORKERS" &
 BACKEND_PID=$!
 
-echo "Waiting for backend to start..."
-sleep 30
-
-if ! kill -0 $BACKEND_PID 2>/dev/null; then
-    echo "Backend failed to start at initialization, exiting"
-    exit 1
-fi
+echo "Waiting for backend to become healthy..."
+WAITED=0
+until wget -q -O /dev/null http://127.0.0.1:8001/api/health 2>/dev/null; do
+    if ! kill -0 $BACKEND_PID 2>/dev/null; then
+        echo "Backend failed to start at initialization, exiting"
+        exit 1
+    fi
+    if [ "$WAITED" -ge "$STARTUP_TIMEOUT" ]; then
+        echo "Backend not healthy after ${STARTUP_TIMEOUT}s, exiting"
+        kill $BACKEND_PID
+        exit 1
+    fi
+    sleep 1
+    WAITED=$((WAITED + 1))
+done
+echo "Backend healthy after ${WAITED}s"
 
 # Start Nginx
 nginx -g 'daemon off;' &
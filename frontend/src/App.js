@@ -17,12 +17,10 @@ const Dashboard = () => {
 
   const fetchDashboardData = async () => {
     try {
-      const [statsRes, prayerRes] = await Promise.all([
-        axios.get(`${API}/dashboard/stats`),
-        axios.get(`${API}/prayer-times`)
-      ]);
-      setStats(statsRes.data);
-      setPrayerTimes(prayerRes.data);
+      // One round trip for everything the first screen needs
+      const response = await axios.get(`${API}/bootstrap`);
+      setStats(response.data.dashboard);
+      setPrayerTimes(response.data.prayer_times);
       setLoading(false);
     } catch (error) {
       console.error('Error fetching dashboard data:', error);
@@ -0,0 +1,52 @@
+"""Fuzzy name ranking behind GET /api/members/search"""
+import os
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+# server reads these at import; nothing here connects to MongoDB
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "masjid_test")
+
+import server
+
+
+class NameScoreTest(unittest.TestCase):
+    def test_exact_beats_prefix_beats_misspelling(self):
+        exact = server.name_score(["mohammed", "rafiq"], ["mohammed", "rafiq"])
+        prefix = server.name_score(["mohammed", "rafiq"], ["moham", "rafiq"])
+        misspelt = server.name_score(["mohammed", "rafiq"], ["mohamed", "rafiq"])
+        self.assertGreater(exact, prefix)
+        self.assertGreater(prefix, misspelt)
+
+    def test_misspelling_within_edit_distance(self):
+        self.assertIsNotNone(server.name_score(["muhammad", "khan"], ["muhamad"]))
+        self.assertIsNotNone(server.name_score(["rafeeq"], ["rafeq"]))
+
+    def test_unrelated_name_does_not_match(self):
+        self.assertIsNone(server.name_score(["abdul", "rahman"], ["mohamed"]))
+        self.assertIsNone(server.name_score(["ali"], ["mohammed"]))
+
+    def test_every_query_word_must_match(self):
+        self.assertIsNone(server.name_score(["mohammed", "rafiq"], ["mohammed", "pasha"]))
+
+    def test_shorter_name_ranks_higher(self):
+        short = server.name_score(["syed", "ali"], ["syed"])
+        long = server.name_score(["syed", "mohammed", "ali"], ["syed"])
+        self.assertGreater(short, long)
+
+
+class AccountPrefixTest(unittest.TestCase):
+    def test_partial_account_number(self):
+        self.assertEqual(server.account_prefix("mm1a"), "MM1A")
+        self.assertEqual(server.account_prefix("MM1A2B3C4D"), "MM1A2B3C4D")
+
+    def test_names_and_short_queries_are_not_prefixes(self):
+        for q in ("m", "mm", "mohammed", "M1"):
+            with self.subTest(q=q):
+                self.assertIsNone(server.account_prefix(q))
+
+
+if __name__ == "__main__":
+    unittest.main()
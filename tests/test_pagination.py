@@ -0,0 +1,34 @@
+"""Keyset pagination cursors in server.py"""
+import os
+import sys
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+# server reads these at import; nothing here connects to MongoDB
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "masjid_test")
+
+from fastapi import HTTPException
+
+import server
+
+
+class CursorTest(unittest.TestCase):
+    def test_round_trip(self):
+        sort_value = datetime(2025, 1, 2, 3, 4, 5, 678000)
+        cursor = server.encode_cursor(sort_value, "a1b2")
+        self.assertNotIn("=", cursor)
+        self.assertEqual(server.decode_cursor(cursor), (sort_value, "a1b2"))
+
+    def test_invalid_cursor_is_a_400(self):
+        for cursor in ("not-a-cursor", server.encode_cursor(datetime(2025, 1, 1), "x")[:-3], ""):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(HTTPException) as raised:
+                    server.decode_cursor(cursor)
+                self.assertEqual(raised.exception.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+"""prayer_calc against reference times for Bangalore (Aladhan method 4, Umm al-Qura)
+
+The expected Dhuhr, Asr and Maghrib times come from the PrayTimes.org reference
+implementation that Aladhan builds on, with the Makkah (Umm al-Qura) parameters.
+Fajr is the 18.5 degree time from the same formulas, and Isha is Maghrib plus 90
+minutes, or 120 in Ramadan. These were not checked against a live Aladhan response.
+"""
+import sys
+import unittest
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from prayer_calc import compute_prayer_times
+
+LAT, LON, TZ = 12.9715987, 77.5945627, 5.5
+
+EXPECTED = {
+    date(2025, 1, 15): {"fajr": "05:29", "dhuhr": "12:29", "asr": "15:46", "maghrib": "18:12", "isha": "19:42"},
+    date(2025, 6, 21): {"fajr": "04:33", "dhuhr": "12:21", "asr": "15:48", "maghrib": "18:48", "isha": "20:18"},
+    date(2025, 10, 1): {"fajr": "04:56", "dhuhr": "12:09", "asr": "15:29", "maghrib": "18:09", "isha": "19:39"},
+    # 10 Ramadan 1446: Isha moves to two hours after Maghrib
+    date(2025, 3, 10): {"fajr": "05:18", "dhuhr": "12:30", "asr": "15:50", "maghrib": "18:30", "isha": "20:30"},
+}
+
+
+class PrayerCalcTest(unittest.TestCase):
+    def test_known_days(self):
+        for day, expected in EXPECTED.items():
+            with self.subTest(day=day):
+                [times] = compute_prayer_times(day, day, LAT, LON, TZ)
+                self.assertEqual({name: times[name] for name in expected}, expected)
+
+    def test_range_matches_single_days(self):
+        days = compute_prayer_times(date(2025, 1, 1), date(2025, 12, 31), LAT, LON, TZ)
+        self.assertEqual(len(days), 365)
+        for day, expected in EXPECTED.items():
+            with self.subTest(day=day):
+                times = days[day.timetuple().tm_yday - 1]
+                self.assertEqual(times["date"], day.isoformat())
+                self.assertEqual({name: times[name] for name in expected}, expected)
+
+    def test_hijri_date(self):
+        [times] = compute_prayer_times(date(2025, 3, 10), date(2025, 3, 10), LAT, LON, TZ)
+        self.assertEqual(times["hijri_date"], "10-09-1446 Ramadan 1446")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""Statement row normalization for the bulk payment import"""
+import os
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+# server reads these at import; nothing here connects to MongoDB
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "masjid_test")
+
+import server
+
+
+class NormalizeStatementRowTest(unittest.TestCase):
+    def test_bank_column_aliases(self):
+        row = server.normalize_statement_row({
+            "UTR No": " 412345678901 ",
+            "Credit": "1,000.00",
+            "Txn Date": "05/01/2025",
+            "Narration": "chanda jan",
+            "Payer Mobile": "9845012345",
+        })
+        self.assertEqual(row, {
+            "transaction_id": "412345678901",
+            "amount": "1,000.00",
+            "payment_date": "05/01/2025",
+            "remarks": "chanda jan",
+            "phone": "9845012345",
+        })
+
+    def test_blank_cells_are_dropped(self):
+        row = server.normalize_statement_row({"utr": "", "amount": "500", "remarks": None})
+        self.assertEqual(row, {"amount": "500"})
+
+    def test_account_number_from_remarks(self):
+        row = server.normalize_statement_row({"amount": "500", "narration": "chanda mmabcdef12 jan"})
+        self.assertEqual(row["account_number"], "MMABCDEF12")
+
+    def test_account_number_column_wins_over_remarks(self):
+        row = server.normalize_statement_row(
+            {"amount": "500", "account_number": "MM11111111", "remarks": "MM22222222"}
+        )
+        self.assertEqual(row["account_number"], "MM11111111")
+
+
+class ParseStatementLineTest(unittest.TestCase):
+    def test_object(self):
+        self.assertEqual(server.parse_statement_line('{"amount": "500"}'), {"amount": "500"})
+
+    def test_not_an_object(self):
+        for line in ('[1, 2]', '"500"', '500', 'null'):
+            with self.subTest(line=line), self.assertRaisesRegex(ValueError, "Expected a JSON object"):
+                server.parse_statement_line(line)
+
+    def test_invalid_json(self):
+        with self.assertRaisesRegex(ValueError, "Invalid JSON"):
+            server.parse_statement_line('{"amount": ')
+
+
+if __name__ == "__main__":
+    unittest.main()